@@ -2,17 +2,15 @@
 """Defines routes and methods for the amenity resource"""
 from api.v1.views import app_views
 from flask import jsonify, request, abort
+from api.v1.views.pagination import paginate
 from models import storage
 from models.amenity import Amenity
 
 
 @app_views.route('/amenities', methods=['GET'], strict_slashes=False)
 def get_amenities():
-    """Returns all the amenities objects"""
-
-    amenities = storage.all(Amenity).values()
-    amenity_list = [amenity.to_dict() for amenity in amenities]
-    return jsonify(amenity_list)
+    """Returns the amenities objects, a page at a time if limit is given"""
+    return paginate(Amenity)
 
 
 @app_views.route('/amenities/<amenity_id>', methods=['GET'])
@@ -2,6 +2,7 @@
 """Defines routes and methods for the city resource"""
 from flask import abort, request, jsonify
 from api.v1.views import app_views
+from api.v1.views.pagination import paginate
 from models import storage
 from models.state import State
 from models.city import City
@@ -10,12 +11,11 @@ from models.city import City
 @app_views.route('/states/<state_id>/cities', methods=['GET'],
                  strict_slashes=False)
 def get_cities_by_state(state_id):
-    """Retrieve a list of City objects by State ID"""
+    """Retrieve a list of City objects by State ID, paginated by limit"""
     state = storage.get(State, state_id)
     if state is None:
         abort(404)
-    cities = [city.to_dict() for city in state.cities]
-    return jsonify(cities)
+    return paginate(City, {"state_id": state.id})
 
 
 @app_views.route('/cities/<city_id>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Keyset pagination helpers shared by the list endpoints"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from flask import abort, jsonify, request
+import json
+from models import storage
+from models.base_model import format_time, parse_time
+
+
+def page_params(source, sort=None):
+    """
+    Returns the (limit, after) given by the limit and cursor of source
+    sort: numeric attribute the cursor was made for, if any
+    Raises ValueError, with the message the view answers, if one is invalid
+    """
+    limit = source.get("limit")
+    cursor = source.get("cursor")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid limit")
+        if limit < 1:
+            raise ValueError("Invalid limit")
+    if cursor is not None and not isinstance(cursor, str):
+        raise ValueError("Invalid cursor")
+    after = None
+    if cursor:
+        try:
+            value, id = json.loads(urlsafe_b64decode(cursor.encode()))
+            if sort is None:
+                parse_time(value)
+            elif isinstance(value, bool) or \
+                    not isinstance(value, (int, float)):
+                raise ValueError("cursor value is not a number")
+            after = (value, str(id))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return limit, after
+
+
+def sort_key(obj, sort=None):
+    """returns the (created_at, id), or (sort value, id), of an object"""
+    if sort is not None:
+        return (getattr(obj, sort.lstrip("-")), obj.id)
+    return (format_time(obj.created_at), obj.id)
+
+
+def encode_cursor(obj, sort=None):
+    """returns the opaque cursor of the page following obj"""
+    key = sort_key(obj, sort)
+    return urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def next_page(objs, limit, sort=None):
+    """
+    Cuts the page out of objs, fetched with one more object than limit
+    sort: numeric attribute the objects are sorted by, if any
+    Returns the objects of the page and the cursor of the next one, if any
+    """
+    if limit is None or len(objs) <= limit:
+        return objs, None
+    return objs[:limit], encode_cursor(objs[limit - 1], sort)
+
+
+def page_response(data, cursor, status_code=200):
+    """returns the JSON response of a page, with the next cursor header"""
+    response = jsonify(data)
+    response.status_code = status_code
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return response
+
+
+def paginate(cls, where=None):
+    """returns the response listing the page of cls asked in the URL"""
+    try:
+        limit, after = page_params(request.args)
+    except ValueError as e:
+        abort(400, str(e))
+    objs = storage.page(cls, where, limit + 1 if limit else None, after)
+    objs, cursor = next_page(objs, limit)
+    return page_response([obj.to_dict() for obj in objs], cursor)
@@ -2,12 +2,16 @@
 """Defines routes and methods for the place resource"""
 from flask import abort, make_response, request, jsonify
 from api.v1.views import app_views
+from api.v1.views.pagination import next_page, page_params, page_response
+from api.v1.views.pagination import paginate
 from models import storage
 from models.city import City
 from models.place import Place
 from models.user import User
-from models.state import State
-from models.amenity import Amenity
+import math
+
+# tuple - place attributes places_search can filter by range and sort by
+ranged = ("price_by_night", "max_guest", "number_rooms", "number_bathrooms")
 
 
 def create_response(data, status_code=200):
@@ -21,8 +25,7 @@ def get_places(id):
     city = storage.get(City, id)
     if not city:
         abort(404)
-    places = [place.to_dict() for place in city.places]
-    return create_response(places)
+    return paginate(Place, {"city_id": city.id})
 
 
 @app_views.route("/places/<id>", methods=["GET"])
@@ -100,32 +103,112 @@ def places_search_enhanced():
     cities = data.get("cities", [])
     amenities = data.get("amenities", [])
 
-    placesList = []
-
-    for state_id in states:
-        state = storage.get(State, state_id)
-        if state:
-            for city in state.cities:
-                placesList.extend(place for place in city.places)
-
-    for city_id in cities:
-        city = storage.get(City, city_id)
-        if city:
-            for place in city.places:
-                if place not in placesList:
-                    placesList.append(place)
-
-    if not placesList:
-        placesList = storage.all(Place).values()
-
-    for amenity_id in amenities:
-        amenity = storage.get(Amenity, amenity_id)
-        placesList = [
-                place for place in placesList if amenity in place.amenities
-                ]
+    where = range_conditions(data.get("ranges", {}))
+    if where is None:
+        return create_response({"error": "Invalid ranges"}, 400)
+    sort = data.get("sort")
+    if sort is not None and (not isinstance(sort, str) or
+                             sort.lstrip("-") not in ranged):
+        return create_response({"error": "Invalid sort"}, 400)
+
+    try:
+        limit, after = page_params(data, sort)
+    except ValueError as e:
+        return create_response({"error": str(e)}, 400)
+    placesList = storage.search_places(states, cities, amenities,
+                                       limit + 1 if limit else None, after,
+                                       where, sort)
+    placesList, cursor = next_page(placesList, limit, sort)
 
     places = [place.to_dict() for place in placesList]
     for place in places:
         place.pop("amenities", None)
 
+    if data.get("facets"):
+        facets = storage.facet_places(states, cities, amenities, where)
+        return page_response({"results": places, "facets": facets}, cursor)
+    return page_response(places, cursor)
+
+
+def range_conditions(ranges):
+    """
+    Returns the where conditions of the ranges of a places_search, given as
+    {attribute: {"min": low, "max": high}} with either bound optional,
+    or None if they are invalid
+    """
+    if not isinstance(ranges, dict):
+        return None
+    where = {}
+    for name, bounds in ranges.items():
+        if name not in ranged or not isinstance(bounds, dict) or \
+           not set(bounds) <= {"min", "max"}:
+            return None
+        low, high = bounds.get("min"), bounds.get("max")
+        for bound in (low, high):
+            if bound is not None and (isinstance(bound, bool) or
+                                      not isinstance(bound, (int, float))):
+                return None
+        if low is not None and high is not None:
+            where[name] = ("between", (low, high))
+        elif low is not None:
+            where[name] = (">=", low)
+        elif high is not None:
+            where[name] = ("<=", high)
+    return where
+
+
+def coordinates(names, lows, highs):
+    """returns the floats given by names in the URL, None if one is bad"""
+    values = []
+    for name, low, high in zip(names, lows, highs):
+        try:
+            value = float(request.args[name])
+        except (KeyError, ValueError):
+            return None
+        if not low <= value <= high:
+            return None
+        values.append(value)
+    return values
+
+
+@app_views.route("/places/nearby", methods=["GET"])
+def places_nearby():
+    point = coordinates(("lat", "lng"), (-90, -180), (90, 180))
+    if point is None:
+        return create_response({"error": "Invalid coordinates"}, 400)
+    try:
+        k = int(request.args.get("k", 10))
+        radius = request.args.get("radius")
+        radius = float(radius) if radius is not None else None
+    except ValueError:
+        return create_response({"error": "Invalid k or radius"}, 400)
+    if k < 1 or (radius is not None and
+                 (not math.isfinite(radius) or radius <= 0)):
+        return create_response({"error": "Invalid k or radius"}, 400)
+
+    places = []
+    for place, dist in storage.nearest_places(point[0], point[1], k, radius):
+        place = place.to_dict()
+        place.pop("amenities", None)
+        place["distance"] = round(dist, 3)
+        places.append(place)
+    return create_response(places)
+
+
+@app_views.route("/places/within", methods=["GET"])
+def places_within():
+    box = coordinates(("south", "west", "north", "east"),
+                      (-90, -180, -90, -180), (90, 180, 90, 180))
+    if box is None or box[0] > box[2]:
+        return create_response({"error": "Invalid bounding box"}, 400)
+    try:
+        limit = page_params(request.args)[0]
+    except ValueError as e:
+        return create_response({"error": str(e)}, 400)
+
+    places = []
+    for place in storage.places_within(*box, limit=limit):
+        place = place.to_dict()
+        place.pop("amenities", None)
+        places.append(place)
     return create_response(places)
@@ -0,0 +1,32 @@
+#!/usr/bin/python3
+"""Defines the full-text search route over places and reviews"""
+from api.v1.views import app_views
+from api.v1.views.pagination import page_params
+from flask import abort, jsonify, request
+from models import storage
+from models.place import Place
+from models.review import Review
+
+
+@app_views.route('/search', methods=['GET'], strict_slashes=False)
+def search():
+    """Returns the places and reviews best matching the words of q"""
+    text = request.args.get("q", "").strip()
+    if not text:
+        abort(400, "Missing q")
+    types = {"Place": Place, "Review": Review}
+    name = request.args.get("type")
+    if name is not None and name not in types:
+        abort(400, "Invalid type")
+    try:
+        limit = page_params(request.args)[0] or 10
+    except ValueError as e:
+        abort(400, str(e))
+
+    results = []
+    for obj, score in storage.search(text, types.get(name), limit):
+        obj = obj.to_dict()
+        obj.pop("amenities", None)
+        obj["score"] = round(score, 4)
+        results.append(obj)
+    return jsonify(results)
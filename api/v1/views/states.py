@@ -2,17 +2,15 @@
 """Defines routes and methods for the state resource"""
 from api.v1.views import app_views
 from flask import jsonify, request, abort
+from api.v1.views.pagination import paginate
 from models import storage
 from models.state import State
 
 
 @app_views.route('/states', methods=['GET'], strict_slashes=False)
 def get_states():
-    """Returns all the states objects"""
-
-    states = storage.all(State).values()
-    state_list = [state.to_dict() for state in states]
-    return jsonify(state_list)
+    """Returns the states objects, a page at a time if limit is given"""
+    return paginate(State)
 
 
 @app_views.route('/states/<state_id>', methods=['GET'])
@@ -2,17 +2,15 @@
 """Defines routes and methods for the user resource"""
 from api.v1.views import app_views
 from flask import jsonify, request, abort
+from api.v1.views.pagination import paginate
 from models import storage
 from models.user import User
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def get_users():
-    """Returns all the users objects"""
-
-    users = storage.all(User).values()
-    user_list = [user.to_dict() for user in users]
-    return jsonify(user_list)
+    """Returns the users objects, a page at a time if limit is given"""
+    return paginate(User)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'])
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""
+Measures how long DBStorage takes to insert reviews through the unit of
+work (new() for each object, then one save()) and through the bulk path
+(bulk_new(), then bulk_save()), each in a process of its own on a fresh
+SQLite database, or on the MySQL database of the HBNB_MYSQL_* variables
+when HBNB_TYPE_STORAGE=db is set
+
+usage: ./benchmarks/bulk_insert.py [number of reviews]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# string - root of the repository, put on the path of the measurements
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# list - paths measured
+paths = ["unit of work", "bulk"]
+
+
+def measure(path, count):
+    """prints the seconds one insert of count reviews takes, as JSON"""
+    from models import storage
+    from models.city import City
+    from models.place import Place
+    from models.review import Review
+    from models.state import State
+    from models.user import User
+    state = State(name="State")
+    city = City(name="City", state_id=state.id)
+    user = User(email="user@hbnb.io", password="pwd")
+    places = [Place(name="Place {}".format(i), city_id=city.id,
+                    user_id=user.id) for i in range(100)]
+    for obj in [state, city, user] + places:
+        storage.new(obj)
+    storage.save()
+    reviews = [Review(text="Review {} of a nice place".format(i),
+                      place_id=places[i % 100].id, user_id=user.id)
+               for i in range(count)]
+    before = storage.count(Review)
+    start = time.perf_counter()
+    if path == "bulk":
+        storage.bulk_new(reviews)
+        storage.bulk_save()
+    else:
+        for review in reviews:
+            storage.new(review)
+        storage.save()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed,
+                      "count": storage.count(Review) - before}))
+
+
+def main(count):
+    """runs each path on its own database and reports the rows/s"""
+    print("insert of {} reviews".format(count))
+    print("{:>14} {:>10} {:>10}".format("path", "seconds", "rows/s"))
+    for path in paths:
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PYTHONPATH=root)
+            if env.get("HBNB_TYPE_STORAGE") != "db":
+                env.update(HBNB_TYPE_STORAGE="sqlite", HBNB_ENV="test",
+                           HBNB_SQLITE_DB=os.path.join(directory, "hbnb.db"))
+            out = subprocess.run([sys.executable, __file__, "--measure",
+                                  path, str(count)], cwd=directory, env=env,
+                                 check=True, stdout=subprocess.PIPE).stdout
+            result = json.loads(out.decode().splitlines()[-1])
+            assert result["count"] == count
+            print("{:>14} {:>10.2f} {:>10.0f}".format(
+                path, result["seconds"], count / result["seconds"]))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""
+Measures how fast models are built from to_dict() records, as reload()
+does, and serialized back by to_dict(): the construction path of
+BaseModel (one dictionary update, dates parsed by fromisoformat) against
+the previous one (one setattr() per attribute, dates parsed by strptime)
+
+usage: ./benchmarks/construct_base_model.py [number of records]
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from models.base_model import time as fmt  # noqa: E402
+from models.place import Place  # noqa: E402
+
+
+class Previous(Place):
+    """
+    Place built and serialized the way BaseModel used to, through
+    object.__setattr__ as there was no storage hook on attributes then
+    """
+
+    def __init__(self, *args, **kwargs):
+        """sets every attribute through setattr() and parses by strptime"""
+        for key, value in kwargs.items():
+            if key != "__class__":
+                object.__setattr__(self, key, value)
+        if kwargs.get("created_at", None) and type(self.created_at) is str:
+            object.__setattr__(self, "created_at", datetime.strptime(
+                kwargs["created_at"], fmt))
+        if kwargs.get("updated_at", None) and type(self.updated_at) is str:
+            object.__setattr__(self, "updated_at", datetime.strptime(
+                kwargs["updated_at"], fmt))
+
+    def to_dict(self):
+        """formats the dates by strftime"""
+        new_dict = self.__dict__.copy()
+        if "created_at" in new_dict:
+            new_dict["created_at"] = new_dict["created_at"].strftime(fmt)
+        if "updated_at" in new_dict:
+            new_dict["updated_at"] = new_dict["updated_at"].strftime(fmt)
+        new_dict["__class__"] = self.__class__.__name__
+        if "_sa_instance_state" in new_dict:
+            del new_dict["_sa_instance_state"]
+        return new_dict
+
+
+def generate(count):
+    """returns count records shaped like the to_dict() of places"""
+    start = datetime(2020, 1, 1)
+    records = []
+    for i in range(count):
+        stamp = (start + timedelta(seconds=i, microseconds=i)).isoformat(
+            timespec="microseconds")
+        records.append({"id": str(uuid.uuid4()), "created_at": stamp,
+                        "updated_at": stamp, "__class__": "Place",
+                        "city_id": "c", "user_id": "u",
+                        "name": "Place {}".format(i),
+                        "description": "A place to stay",
+                        "number_rooms": i % 5, "number_bathrooms": i % 3,
+                        "max_guest": i % 8, "price_by_night": i % 300,
+                        "latitude": 1.0, "longitude": 2.0})
+    return records
+
+
+def measure(cls, records):
+    """returns the seconds taken to build and to serialize the records"""
+    begin = time.perf_counter()
+    objs = [cls(**record) for record in records]
+    built = time.perf_counter()
+    dicts = [obj.to_dict() for obj in objs]
+    done = time.perf_counter()
+    assert dicts[-1]["created_at"] == records[-1]["created_at"]
+    return built - begin, done - built
+
+
+def main():
+    """prints the seconds per path and the speedup"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    records = generate(count)
+    before = measure(Previous, records)
+    after = measure(Place, records)
+    print("{:d} records".format(count))
+    print("{:<10} {:>10} {:>10}".format("path", "build s", "to_dict s"))
+    print("{:<10} {:>10.2f} {:>10.2f}".format("previous", *before))
+    print("{:<10} {:>10.2f} {:>10.2f}".format("current", *after))
+    print("{:<10} {:>9.1f}x {:>9.1f}x".format(
+        "speedup", before[0] / after[0], before[1] / after[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Measures the start-up cost of the models package and of the console, in
+file mode and in SQLite mode: the cumulative import time of models and of
+console reported by python -X importtime, whether SQLAlchemy got
+imported, and the wall time of a console session running only quit
+(medians of several runs, each in a fresh interpreter)
+
+usage: ./benchmarks/import_time.py [number of runs]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# string - root of the repository, where the commands are run
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# list - (name, environment) of the storage modes measured
+modes = [("file", {}), ("sqlite", {"HBNB_TYPE_STORAGE": "sqlite"})]
+# compiled regex - cumulative microseconds and name of each import
+line = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$", re.M)
+
+
+def imports(module, env):
+    """
+    Imports module in a fresh interpreter
+    Returns its cumulative import time in microseconds and whether
+    SQLAlchemy was imported
+    """
+    code = "import {}".format(module)
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         cwd=root, env=env, check=True,
+                         stderr=subprocess.PIPE).stderr.decode()
+    found = line.findall(err)
+    top = {name: int(micros) for micros, indent, name in found if not indent}
+    return top[module], any(name == "sqlalchemy" for micros, indent, name
+                            in found)
+
+
+def session(env):
+    """returns the wall time in seconds of a console session running quit"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "console.py"], cwd=root, env=env,
+                   input=b"quit\n", check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(runs):
+    """prints the medians of runs measurements of each mode"""
+    print("medians of {} runs".format(runs))
+    print("{:>8} {:>12} {:>12} {:>11} {:>11}".format(
+        "mode", "models ms", "console ms", "sqlalchemy", "session ms"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, mode in modes:
+            env = dict(os.environ, HBNB_SQLITE_DB=os.path.join(
+                directory, "hbnb.db"), **mode)
+            if not mode:
+                env.pop("HBNB_TYPE_STORAGE", None)
+            models = [imports("models", env) for i in range(runs)]
+            console = [imports("console", env) for i in range(runs)]
+            sessions = [session(env) for i in range(runs)]
+            print("{:>8} {:>12.1f} {:>12.1f} {:>11} {:>11.1f}".format(
+                name, statistics.median(t for t, sa in models) / 1000,
+                statistics.median(t for t, sa in console) / 1000,
+                "yes" if console[0][1] else "no",
+                statistics.median(sessions) * 1000))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
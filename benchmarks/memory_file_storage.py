@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+"""
+Measures the memory FileStorage needs per 100k reloaded objects, with
+every object built (default), kept raw (HBNB_FILE_LAZY=1) or kept in
+columns (HBNB_FILE_COLUMNAR=1): the memory still allocated once reload()
+returns, its peak during reload(), the memory still allocated once every
+object was read through all(cls) (traced by tracemalloc, in a run of
+their own) and the growth of the resident set size
+
+usage: ./benchmarks/memory_file_storage.py [number of objects]
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+# string - root of the repository, put on the path of the measurements
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# list - (name, environment) of the representations measured
+modes = [("objects", {}), ("lazy", {"HBNB_FILE_LAZY": "1"}),
+         ("columnar", {"HBNB_FILE_COLUMNAR": "1"})]
+
+
+def generate(path, count):
+    """writes count objects shaped like the models to the JSON file path"""
+    start = datetime(2020, 1, 1)
+    states = [str(uuid.uuid4()) for i in range(max(1, count // 1000))]
+    cities = [str(uuid.uuid4()) for i in range(max(1, count // 100))]
+    users = [str(uuid.uuid4()) for i in range(max(1, count // 10))]
+    amenities = [str(uuid.uuid4()) for i in range(20)]
+    places = []
+    objects = {}
+    for i in range(count):
+        id = str(uuid.uuid4())
+        stamp = (start + timedelta(seconds=i, microseconds=i)).isoformat(
+            timespec="microseconds")
+        record = {"id": id, "created_at": stamp, "updated_at": stamp}
+        if i % 2:
+            record.update(__class__="Review", place_id=places[i // 8],
+                          user_id=users[i % len(users)],
+                          text="Review number {} of a nice place".format(i))
+        else:
+            record.update(__class__="Place", city_id=cities[i % len(cities)],
+                          user_id=users[i % len(users)],
+                          name="Place {}".format(i),
+                          description="A place to stay",
+                          number_rooms=i % 5, number_bathrooms=i % 3,
+                          max_guest=i % 8, price_by_night=i % 300,
+                          latitude=(i % 180) - 90.0,
+                          longitude=(i % 360) - 180.0,
+                          amenity_ids=amenities[:i % 4])
+            places.append(id)
+        objects[record["__class__"] + "." + id] = record
+    with open(path, "w") as f:
+        json.dump(objects, f)
+
+
+def resident():
+    """returns the resident memory of this process in bytes"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(path, traced):
+    """prints the memory and time one reload of path takes, as JSON"""
+    import gc
+    import models
+    import tracemalloc
+    from models.engine.file_storage import FileStorage
+    # loaded first, or the first object reload() builds would load it
+    # from the same path
+    models.storage
+    storage = FileStorage()
+    FileStorage._FileStorage__file_path = path
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    before = resident()
+    start = time.perf_counter()
+    storage.reload()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    result = {"rss": resident() - before, "seconds": elapsed,
+              "count": storage.count()}
+    if traced:
+        result["live"], result["peak"] = tracemalloc.get_traced_memory()
+    for name in ("Place", "Review"):
+        for obj in storage.all(name).values():
+            obj.to_dict()
+    gc.collect()
+    if traced:
+        result["read"] = tracemalloc.get_traced_memory()[0]
+    print(json.dumps(result))
+
+
+def run(directory, path, env, traced):
+    """returns the result of measure() run in a process of its own"""
+    args = [sys.executable, __file__, "--measure", path]
+    out = subprocess.run(args + ["--traced"] * traced, cwd=directory,
+                         env=env, check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(out.decode().splitlines()[-1])
+
+
+def main(count):
+    """generates count objects and reports each representation"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.json")
+        generate(path, count)
+        print("MB per 100k objects, reload of {} objects".format(count))
+        print("{:>10} {:>8} {:>8} {:>8} {:>8} {:>10}".format(
+            "mode", "live", "peak", "read", "rss", "reload s"))
+        for name, env in modes:
+            env = dict(os.environ, PYTHONPATH=root, **env)
+            env.pop("HBNB_TYPE_STORAGE", None)
+            result = run(directory, path, env, False)
+            traced = run(directory, path, env, True)
+            result.update(live=traced["live"], peak=traced["peak"],
+                          read=traced["read"])
+            scale = 100000 / result["count"] / 2 ** 20
+            print("{:>10} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.1f} {:>10.2f}"
+                  .format(name, result["live"] * scale,
+                          result["peak"] * scale, result["read"] * scale,
+                          result["rss"] * scale, result["seconds"]))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], "--traced" in sys.argv)
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -2,24 +2,44 @@
 """ console """
 
 import cmd
+import csv
 from datetime import datetime
+import json
 import models
 from models.amenity import Amenity
-from models.base_model import BaseModel
+from models.base_model import BaseModel, format_time
 from models.city import City
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
 import shlex  # for splitting the line along spaces except in double quotes
+import sys
+import time
 
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# tuple - attributes whose values are integers, converted from text
+integers = ("number_rooms", "number_bathrooms", "max_guest", "price_by_night")
+# tuple - attributes whose values are floats, converted from text
+floats = ("latitude", "longitude")
+# integer - number of objects import saves at once
+chunk_size = 10000
+# integer - number of rejected records import reports line by line
+max_rejects = 10
+# integer - number of objects read from storage at once
+page_size = 1000
 
 
 class HBNBCommand(cmd.Cmd):
     """ HBNH console """
     prompt = '(hbnb) '
+    # boolean - changes are kept in memory until commit or rollback
+    transaction = False
+    # boolean - reading a script: the open transaction is committed at EOF
+    batch = False
+    # integer - number of records rejected by the running import
+    rejected = 0
 
     def do_EOF(self, arg):
         """Exits console"""
@@ -33,6 +53,49 @@ class HBNBCommand(cmd.Cmd):
         """Quit command to exit the program"""
         return True
 
+    def postloop(self):
+        """commits the transaction left open by a batch, rolls back others"""
+        if self.transaction:
+            if self.batch:
+                self.do_commit("")
+            else:
+                print("** transaction rolled back **")
+                self.do_rollback("")
+
+    def do_begin(self, arg):
+        """Starts a transaction: changes are saved at once by commit"""
+        if self.transaction:
+            print("** transaction already open **")
+            return False
+        self.transaction = True
+
+    def do_commit(self, arg):
+        """Saves all the changes made since begin"""
+        if not self.transaction:
+            print("** no transaction open **")
+            return False
+        self.transaction = False
+        models.storage.save()
+
+    def do_rollback(self, arg):
+        """Discards all the changes made since begin"""
+        if not self.transaction:
+            print("** no transaction open **")
+            return False
+        self.transaction = False
+        models.storage.rollback()
+
+    def _save(self, obj=None):
+        """saves obj, or the deletions, unless a transaction is open"""
+        if not self.transaction:
+            if obj is not None:
+                obj.save()
+            else:
+                models.storage.save()
+        elif obj is not None:
+            obj.updated_at = datetime.utcnow()
+            models.storage.new(obj)
+
     def _key_value_parser(self, args):
         """creates a dictionary from a list of strings"""
         new_dict = {}
@@ -67,7 +130,7 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
             return False
         print(instance.id)
-        instance.save()
+        self._save(instance)
 
     def do_show(self, arg):
         """Prints an instance as a string based on the class and id"""
@@ -77,9 +140,9 @@ class HBNBCommand(cmd.Cmd):
             return False
         if args[0] in classes:
             if len(args) > 1:
-                key = args[0] + "." + args[1]
-                if key in models.storage.all():
-                    print(models.storage.all()[key])
+                obj = models.storage.get(classes[args[0]], args[1])
+                if obj is not None:
+                    print(obj)
                 else:
                     print("** no instance found **")
             else:
@@ -94,10 +157,10 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
         elif args[0] in classes:
             if len(args) > 1:
-                key = args[0] + "." + args[1]
-                if key in models.storage.all():
-                    models.storage.all().pop(key)
-                    models.storage.save()
+                obj = models.storage.get(classes[args[0]], args[1])
+                if obj is not None:
+                    models.storage.delete(obj)
+                    self._save()
                 else:
                     print("** no instance found **")
             else:
@@ -106,34 +169,155 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
 
     def do_all(self, arg):
-        """Prints string representations of instances"""
-        args = shlex.split(arg)
-        obj_list = []
-        if len(args) == 0:
-            obj_dict = models.storage.all()
-        elif args[0] in classes:
-            obj_dict = models.storage.all(classes[args[0]])
-        else:
+        """Prints string representations of instances
+        Usage: all [class name] [--where attr=value]... [--limit n]
+                   [--fields attr,...]"""
+        try:
+            args, where, limit, fields = self._options(shlex.split(arg))
+        except ValueError as e:
+            print("** {} **".format(e))
+            return False
+        if args and args[0] not in classes:
             print("** class doesn't exist **")
             return False
-        for key in obj_dict:
-            obj_list.append(str(obj_dict[key]))
+        names = args[:1] or list(classes)
+        if args and self._missing(args[0], where):
+            print("** attribute doesn't exist **")
+            return False
         print("[", end="")
-        print(", ".join(obj_list), end="")
+        separator = ""
+        for obj in self._objects(names, where, limit):
+            if fields is None:
+                print(separator + str(obj), end="")
+            else:
+                print(separator + "[{}] ({}) {}".format(
+                    obj.__class__.__name__, obj.id,
+                    {field: getattr(obj, field) for field in fields
+                     if field in obj.__dict__}), end="")
+            separator = ", "
         print("]")
 
+    def do_export(self, arg):
+        """Writes instances as NDJSON, one to_dict() per line
+        Usage: export [class name] [path, - for stdout (default)]
+                      [--where attr=value]... [--limit n]
+                      [--fields attr,...]"""
+        try:
+            args, where, limit, fields = self._options(shlex.split(arg))
+        except ValueError as e:
+            print("** {} **".format(e))
+            return False
+        names = list(classes)
+        if len(args) > 1 and args[0] not in classes:
+            print("** class doesn't exist **")
+            return False
+        if args and args[0] in classes:
+            names = [args.pop(0)]
+            if self._missing(names[0], where):
+                print("** attribute doesn't exist **")
+                return False
+        path = args[0] if args else "-"
+        try:
+            f = sys.stdout if path == "-" else open(path, "w")
+        except OSError as e:
+            print("** cannot write file: {} **".format(e.strerror))
+            return False
+        count = 0
+        try:
+            for obj in self._objects(names, where, limit):
+                record = obj.to_dict()
+                if fields is not None:
+                    record = {field: record[field] for field in fields
+                              if field in record}
+                f.write(json.dumps(record) + "\n")
+                count += 1
+        finally:
+            if f is not sys.stdout:
+                f.close()
+        if f is not sys.stdout:
+            print("{} exported".format(count))
+
+    def _options(self, args):
+        """
+        Splits the --where, --limit and --fields options from args
+        Returns the other arguments, the where dictionary, the limit and
+        the list of fields, raises ValueError if an option is invalid
+        """
+        rest = []
+        where = {}
+        limit = fields = None
+        args = iter(args)
+        for arg in args:
+            if not arg.startswith("--"):
+                rest.append(arg)
+                continue
+            value = next(args, None)
+            if arg not in ("--where", "--limit", "--fields") or value is None:
+                raise ValueError("invalid option " + arg)
+            if arg == "--where":
+                attr, equal, value = value.partition("=")
+                if not attr or not equal:
+                    raise ValueError("invalid condition " + attr)
+                try:
+                    if attr in integers:
+                        value = int(value)
+                    elif attr in floats:
+                        value = float(value)
+                except ValueError:
+                    raise ValueError("invalid value for " + attr)
+                where[attr] = value
+            elif arg == "--limit":
+                try:
+                    limit = int(value)
+                except ValueError:
+                    limit = -1
+                if limit < 0:
+                    raise ValueError("invalid limit")
+            else:
+                fields = [field for field in value.split(",") if field]
+        return rest, where, limit, fields
+
+    def _pageable(self, name, where):
+        """returns True if the storage can select objects of name by where"""
+        if models.storage_t != "db":
+            return True
+        table = getattr(classes[name], "__table__", None)
+        return table is not None and all(attr in table.columns
+                                         for attr in where)
+
+    def _missing(self, name, where):
+        """returns True if the table of name lacks an attribute of where,
+        the classes without a table having no objects to select"""
+        table = getattr(classes[name], "__table__", None)
+        return models.storage_t == "db" and table is not None and \
+            not all(attr in table.columns for attr in where)
+
+    def _objects(self, names, where, limit=None):
+        """yields the objects of the classes names matching where, by page"""
+        for name in names:
+            if not self._pageable(name, where):
+                continue
+            after = None
+            while limit is None or limit > 0:
+                size = page_size if limit is None else min(page_size, limit)
+                objs = models.storage.page(classes[name], where, size, after)
+                for obj in objs:
+                    yield obj
+                if limit is not None:
+                    limit -= len(objs)
+                if len(objs) < size:
+                    break
+                after = (format_time(objs[-1].created_at), objs[-1].id)
+
     def do_update(self, arg):
         """Update an instance based on the class name, id, attribute & value"""
         args = shlex.split(arg)
-        integers = ["number_rooms", "number_bathrooms", "max_guest",
-                    "price_by_night"]
-        floats = ["latitude", "longitude"]
         if len(args) == 0:
             print("** class name missing **")
         elif args[0] in classes:
             if len(args) > 1:
-                k = args[0] + "." + args[1]
-                if k in models.storage.all():
+                obj = models.storage.get(classes[args[0]], args[1])
+                if obj is not None:
                     if len(args) > 2:
                         if len(args) > 3:
                             if args[0] == "Place":
@@ -147,8 +331,8 @@ class HBNBCommand(cmd.Cmd):
                                         args[3] = float(args[3])
                                     except:
                                         args[3] = 0.0
-                            setattr(models.storage.all()[k], args[2], args[3])
-                            models.storage.all()[k].save()
+                            setattr(obj, args[2], args[3])
+                            self._save(obj)
                         else:
                             print("** value missing **")
                     else:
@@ -160,5 +344,163 @@ class HBNBCommand(cmd.Cmd):
         else:
             print("** class doesn't exist **")
 
+    def do_import(self, arg):
+        """Creates the objects of a NDJSON or CSV file (- for stdin)
+        Usage: import <class name|auto> <path> [chunk size]"""
+        args = shlex.split(arg)
+        if len(args) == 0:
+            print("** class name missing **")
+            return False
+        if args[0] not in classes and args[0] != "auto":
+            print("** class doesn't exist **")
+            return False
+        if len(args) < 2:
+            print("** file path missing **")
+            return False
+        size = chunk_size
+        if len(args) > 2:
+            try:
+                size = int(args[2])
+            except ValueError:
+                size = 0
+            if size < 1:
+                print("** invalid chunk size **")
+                return False
+        try:
+            f = sys.stdin if args[1] == "-" else open(args[1], newline="")
+        except OSError as e:
+            print("** cannot read file: {} **".format(e.strerror))
+            return False
+        start = time.perf_counter()
+        imported = line = 0
+        self.rejected = 0
+        chunk = []
+        seen = set()
+        try:
+            for line, record in self._records(f, args[1].endswith(".csv")):
+                try:
+                    chunk.append((line, self._build(args[0], record, seen)))
+                except ValueError as e:
+                    self._reject(line, e)
+                    continue
+                if len(chunk) == size:
+                    imported += self._import_chunk(chunk, line)
+                    chunk = []
+                    seen = set()
+            imported += self._import_chunk(chunk, line)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        elapsed = time.perf_counter() - start
+        print("{} imported, {} rejected in {:.2f}s ({:.0f} rows/s)".format(
+            imported, self.rejected, elapsed, imported / (elapsed or 1e-9)))
+
+    def _reject(self, line, error):
+        """counts a rejected record, reports the first max_rejects ones"""
+        self.rejected += 1
+        if self.rejected <= max_rejects:
+            print("** line {}: {} **".format(line, error))
+
+    def _records(self, f, is_csv):
+        """yields the line number and record of every line of f"""
+        if is_csv:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, {key: value for key, value
+                                        in record.items() if value != ""}
+            return
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                yield line, None
+
+    def _build(self, name, record, seen):
+        """returns the object of a record, raises ValueError if invalid or
+        if its id is in seen, the keys of the records of the chunk"""
+        if not isinstance(record, dict):
+            raise ValueError("not a JSON object")
+        record = dict(record)
+        if name == "auto":
+            name = record.get("__class__")
+            if name not in classes:
+                raise ValueError("unknown class {}".format(name))
+        elif record.get("__class__", name) != name:
+            raise ValueError("record of another class")
+        cls = classes[name]
+        for key, value in record.items():
+            if type(value) is str:
+                if key in integers:
+                    record[key] = int(value)
+                elif key in floats:
+                    record[key] = float(value)
+        if not isinstance(record.get("id", ""), str):
+            raise ValueError("id is not a string")
+        if models.storage_t == "db":
+            if not hasattr(cls, "__table__"):
+                raise ValueError("{} is not stored".format(name))
+            missing = [column.name for column in cls.__table__.columns
+                       if not column.nullable and column.default is None and
+                       not column.primary_key and column.name not in record]
+            if missing:
+                raise ValueError("missing " + ", ".join(missing))
+        key = None
+        if "id" in record:
+            key = name + "." + record["id"]
+            if key in seen:
+                raise ValueError("id {} already exists".format(record["id"]))
+        try:
+            obj = cls(**record)
+        except (TypeError, ValueError) as e:
+            raise ValueError(str(e))
+        if key is not None:
+            seen.add(key)
+        return obj
+
+    def _import_chunk(self, chunk, line):
+        """
+        saves a chunk of (line, imported object), rejecting the objects
+        whose id is stored, returns how many were saved
+        """
+        by_class = {}
+        for number, obj in chunk:
+            by_class.setdefault(obj.__class__, {})[obj.id] = number
+        stored = {}
+        for cls, ids in by_class.items():
+            ids = list(ids.items())
+            for i in range(0, len(ids), page_size):
+                lines = dict(ids[i:i + page_size])
+                where = {"id": ("in", list(lines))}
+                for obj in models.storage.query(cls, where):
+                    stored[(cls, obj.id)] = lines[obj.id]
+        for (cls, id), number in sorted(stored.items(), key=lambda s: s[1]):
+            self._reject(number, "id {} already exists".format(id))
+        objs = [obj for number, obj in chunk
+                if (obj.__class__, obj.id) not in stored]
+        if not objs:
+            return 0
+        if self.transaction:
+            for obj in objs:
+                models.storage.new(obj)
+            return len(objs)
+        models.storage.bulk_new(objs)
+        try:
+            models.storage.bulk_save(amenities=True)
+        except Exception as e:
+            models.storage.rollback()
+            self.rejected += len(objs)
+            print("** chunk ending at line {} not saved: {} **".format(
+                line, str(e).splitlines()[0]))
+            return 0
+        return len(objs)
+
+
 if __name__ == '__main__':
-    HBNBCommand().cmdloop()
+    console = HBNBCommand()
+    if "--batch" in sys.argv[1:]:
+        # a script piped in runs in one transaction, without prompts
+        console.prompt = ""
+        console.batch = console.transaction = True
+    console.cmdloop()
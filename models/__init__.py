@@ -3,15 +3,37 @@
 initialize the models package
 """
 
+from importlib import import_module
 from os import getenv
 
 
 storage_t = getenv("HBNB_TYPE_STORAGE")
+# dictionary - module and class of the storage engine of each storage_t
+engines = {"db": ("models.engine.db_storage", "DBStorage"),
+           "sqlite": ("models.engine.sqlite_storage", "SQLiteStorage"),
+           None: ("models.engine.file_storage", "FileStorage")}
+storage_engine = engines.get(storage_t, engines[None])
+
+if storage_t == "sqlite":
+    # the models are mapped exactly as for MySQL, only the engine differs
+    storage_t = "db"
+
+
+def __getattr__(name):
+    """
+    Imports the storage engine and loads its data the first time
+    models.storage is used, so importing models alone stays cheap
+    """
+    global storage
+    if name != "storage":
+        raise AttributeError("module 'models' has no attribute " + repr(name))
+    module, cls = storage_engine
+    storage = getattr(import_module(module), cls)()
+    storage.reload()
+    return storage
+
 
 if storage_t == "db":
-    from models.engine.db_storage import DBStorage
-    storage = DBStorage()
-else:
-    from models.engine.file_storage import FileStorage
-    storage = FileStorage()
-storage.reload()
+    # the relationships name their classes, which must all be mapped
+    # before the first instance is built, whichever model was imported
+    from models import amenity, city, place, review, state, user
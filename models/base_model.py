@@ -3,17 +3,125 @@
 Contains class BaseModel
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import models
-from os import getenv
-import sqlalchemy
-from sqlalchemy import Column, String, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from os import getenv, urandom
 import uuid
 
+if models.storage_t == "db":
+    # SQLAlchemy is only imported when the models are mapped to tables
+    from sqlalchemy import BINARY, Column, String, DateTime, TypeDecorator
+    from sqlalchemy.dialects.mysql import DATETIME
+    from sqlalchemy.ext.declarative import declarative_base
+
 time = "%Y-%m-%dT%H:%M:%S.%f"
+# dictionary - attributes each class sets through a descriptor, by class
+setters = {}
+# string - kind of the ids of new objects: uuid4 (random) or uuid7
+id_type = getenv("HBNB_ID_TYPE", "uuid4")
+# boolean - DBStorage stores the ids as 16 bytes instead of strings
+binary_ids = getenv("HBNB_BINARY_IDS") == "1"
+# datetime - origin of the timestamps of the uuid7 ids
+epoch = datetime(1970, 1, 1)
+# integer - microseconds since epoch of the last uuid7 id generated
+last_micros = 0
+
+
+def parse_time(value):
+    """returns the datetime of a string formatted like time"""
+    if len(value) == 26 and value[10] == "T" and value[19] == "." and \
+       value[20:].isdigit():
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, time)
+
+
+def format_time(value):
+    """returns a datetime formatted like time"""
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(timespec="microseconds")
+    return value.strftime(time)
+
+
+def uuid7(now=None):
+    """
+    Generates a time-ordered UUID (version 7, RFC 9562) for the datetime
+    now, default utcnow(): 48 bits of milliseconds since epoch, then 12
+    bits of sub-millisecond fraction, so ids generated by this process
+    sort in generation order, and 62 random bits
+    Returns the UUID
+    """
+    global last_micros
+    if now is None:
+        now = datetime.utcnow()
+    micros = max((now - epoch) // timedelta(microseconds=1),
+                 last_micros + 1)
+    last_micros = micros
+    millis, fraction = divmod(micros, 1000)
+    bits = millis << 80 | 0x7 << 76 | (fraction * 4096 // 1000) << 64 | \
+        0b10 << 62 | int.from_bytes(urandom(8), "big") >> 2
+    return uuid.UUID(int=bits)
+
+
+def new_id(now=None):
+    """returns the id of a new object created at now, of kind id_type"""
+    if id_type == "uuid7":
+        return str(uuid7(now))
+    return str(uuid.uuid4())
+
+
+def id_time(id):
+    """returns the datetime encoded in a uuid7 id, or None for other ids"""
+    if len(id) != 36 or id[14] != "7":
+        return None
+    try:
+        bits = uuid.UUID(id).int
+    except ValueError:
+        return None
+    fraction = -(-(bits >> 64 & 0xfff) * 1000 // 4096)
+    return epoch + timedelta(microseconds=(bits >> 80) * 1000 + fraction)
+
+
+def descriptors(cls):
+    """returns the attributes cls sets through a descriptor, like a property"""
+    names = setters.get(cls)
+    if names is None:
+        names = setters[cls] = frozenset(
+            name for klass in cls.__mro__ for name, attr in
+            vars(klass).items()
+            if hasattr(attr, "__set__") and not name.startswith("__"))
+    return names
+
 
 if models.storage_t == "db":
+    class BinaryId(TypeDecorator):
+        """UUID ids stored as 16 bytes by the database, strings in Python"""
+        impl = BINARY(16)
+        cache_ok = True
+
+        def process_bind_param(self, value, dialect):
+            """
+            returns the 16 bytes of an id string, or the encoded string if it
+            is not a UUID so that looking it up finds nothing
+            """
+            if value is None:
+                return None
+            try:
+                return uuid.UUID(value).bytes
+            except ValueError:
+                return value.encode()
+
+        def process_result_value(self, value, dialect):
+            """returns the id string of 16 bytes"""
+            if value is None:
+                return None
+            if len(value) != 16:
+                return bytes(value).decode()
+            return str(uuid.UUID(bytes=bytes(value)))
+
+    def id_column():
+        """returns the column type of the ids: BinaryId if binary_ids"""
+        return BinaryId() if binary_ids else String(60)
+
     Base = declarative_base()
 else:
     Base = object
@@ -22,31 +130,56 @@ else:
 class BaseModel:
     """The BaseModel class from which future classes will be derived"""
     if models.storage_t == "db":
-        id = Column(String(60), primary_key=True)
-        created_at = Column(DateTime, default=datetime.utcnow)
-        updated_at = Column(DateTime, default=datetime.utcnow)
+        id = Column(id_column(), primary_key=True)
+        created_at = Column(DateTime().with_variant(DATETIME(fsp=6), "mysql"),
+                            default=datetime.utcnow, index=True)
+        updated_at = Column(DateTime().with_variant(DATETIME(fsp=6), "mysql"),
+                            default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __init__(self, *args, **kwargs):
         """Initialization of the base model"""
-        if kwargs:
+        if kwargs and models.storage_t != "db":
+            # not stored yet, so the attributes skip __setattr__ and touch()
+            names = descriptors(self.__class__)
+            self.__dict__.update(kwargs)
+            self.__dict__.pop("__class__", None)
+            for key in names.intersection(kwargs):
+                del self.__dict__[key]
+                setattr(self, key, kwargs[key])
+        elif kwargs:
             for key, value in kwargs.items():
                 if key != "__class__":
                     setattr(self, key, value)
+        if kwargs:
+            now = datetime.utcnow()
+            if kwargs.get("id", None) is None:
+                self.id = new_id(now)
+                now = id_time(self.id) or now
             if kwargs.get("created_at", None) and type(self.created_at) is str:
-                self.created_at = datetime.strptime(kwargs["created_at"], time)
+                self.created_at = parse_time(kwargs["created_at"])
             else:
-                self.created_at = datetime.utcnow()
+                self.created_at = now
             if kwargs.get("updated_at", None) and type(self.updated_at) is str:
-                self.updated_at = datetime.strptime(kwargs["updated_at"], time)
+                self.updated_at = parse_time(kwargs["updated_at"])
             else:
-                self.updated_at = datetime.utcnow()
-            if kwargs.get("id", None) is None:
-                self.id = str(uuid.uuid4())
+                self.updated_at = now
         else:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.utcnow()
+            now = datetime.utcnow()
+            self.id = new_id(now)
+            self.created_at = id_time(self.id) or now
             self.updated_at = self.created_at
 
+    if models.storage_t != "db":
+        def __setattr__(self, name, value):
+            """sets an attribute and lets the storage update its indexes"""
+            super().__setattr__(name, value)
+            models.storage.touch(self, name)
+
+        def __delattr__(self, name):
+            """deletes an attribute and lets the storage update its indexes"""
+            super().__delattr__(name)
+            models.storage.touch(self, name)
+
     def __str__(self):
         """String representation of the BaseModel class"""
         return "[{:s}] ({:s}) {}".format(self.__class__.__name__, self.id,
@@ -60,14 +193,20 @@ class BaseModel:
 
     def to_dict(self):
         """returns a dictionary containing all keys/values of the instance"""
+        if models.storage_t != "db":
+            cached = models.storage.cached(self)
+            if cached is not None:
+                return cached.copy()
         new_dict = self.__dict__.copy()
         if "created_at" in new_dict:
-            new_dict["created_at"] = new_dict["created_at"].strftime(time)
+            new_dict["created_at"] = format_time(new_dict["created_at"])
         if "updated_at" in new_dict:
-            new_dict["updated_at"] = new_dict["updated_at"].strftime(time)
+            new_dict["updated_at"] = format_time(new_dict["updated_at"])
         new_dict["__class__"] = self.__class__.__name__
         if "_sa_instance_state" in new_dict:
             del new_dict["_sa_instance_state"]
+        if models.storage_t != "db":
+            models.storage.cache(self, new_dict.copy())
         return new_dict
 
     def delete(self):
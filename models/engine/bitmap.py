@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+"""
+Contains the Bitmap class, a many-to-many membership kept as bit strings
+"""
+
+# list - positions of the bits set in each byte value
+positions = [[bit for bit in range(8) if value >> bit & 1]
+             for value in range(256)]
+
+
+def count(bits):
+    """returns the number of bits set in the integer bits"""
+    return bin(bits).count("1")
+
+
+class Bitmap:
+    """
+    Membership of rows, like places, in columns, like amenities: every row
+    key gets an ordinal and every column id a bit, each row keeps the mask
+    of its columns and each column the bytes of its row ordinals
+    """
+
+    def __init__(self):
+        """Instantiate an empty bitmap"""
+        self.rows = {}
+        self.row_keys = []
+        self.free = []
+        self.masks = []
+        self.columns = {}
+        self.column_ids = []
+        self.bitsets = []
+
+    def __len__(self):
+        """returns the number of rows in the bitmap"""
+        return len(self.rows)
+
+    def set(self, row, columns):
+        """
+        Sets the columns of the row key, replacing its previous ones
+        Returns the list of columns, each one the id kept by the bitmap
+        """
+        self.remove(row)
+        if self.free:
+            ordinal = self.free.pop()
+        else:
+            ordinal = len(self.row_keys)
+            self.row_keys.append(None)
+            self.masks.append(0)
+        self.rows[row] = ordinal
+        self.row_keys[ordinal] = row
+        mask = 0
+        byte, bit = ordinal >> 3, 1 << (ordinal & 7)
+        for column in columns:
+            position = self.columns.get(column)
+            if position is None:
+                position = self.columns[column] = len(self.column_ids)
+                self.column_ids.append(column)
+                self.bitsets.append(bytearray())
+            mask |= 1 << position
+            bitset = self.bitsets[position]
+            if byte >= len(bitset):
+                bitset.extend(bytes(byte + 1 - len(bitset)))
+            bitset[byte] |= bit
+        self.masks[ordinal] = mask
+        return [self.column_ids[self.columns[column]] for column in columns]
+
+    def remove(self, row):
+        """removes the row key and frees its ordinal"""
+        ordinal = self.rows.pop(row, None)
+        if ordinal is None:
+            return
+        byte, bit = ordinal >> 3, 1 << (ordinal & 7)
+        for position in self.__positions(self.masks[ordinal]):
+            self.bitsets[position][byte] &= ~bit & 0xff
+        self.masks[ordinal] = 0
+        self.row_keys[ordinal] = None
+        self.free.append(ordinal)
+
+    def columns_of(self, row):
+        """returns the list of column ids of the row key, None if unknown"""
+        ordinal = self.rows.get(row)
+        if ordinal is None:
+            return None
+        return [self.column_ids[position]
+                for position in self.__positions(self.masks[ordinal])]
+
+    def has_all(self, row, columns):
+        """returns True if the row key is in every column of columns"""
+        ordinal = self.rows.get(row)
+        if ordinal is None:
+            return False
+        mask = 0
+        for column in columns:
+            if column not in self.columns:
+                return False
+            mask |= 1 << self.columns[column]
+        return self.masks[ordinal] & mask == mask
+
+    def column(self, column):
+        """returns the integer whose bits are the row ordinals of column"""
+        position = self.columns.get(column)
+        if position is None:
+            return 0
+        return int.from_bytes(self.bitsets[position], "little")
+
+    def all_of(self, columns):
+        """returns the bits of the rows in every column of columns (AND)"""
+        bits = None
+        for column in columns:
+            bits = self.column(column) if bits is None \
+                else bits & self.column(column)
+            if not bits:
+                return 0
+        return bits if bits is not None else self.rows_mask(self.rows)
+
+    def any_of(self, columns):
+        """returns the bits of the rows in any column of columns (OR)"""
+        bits = 0
+        for column in columns:
+            bits |= self.column(column)
+        return bits
+
+    def rows_mask(self, rows):
+        """returns the bits of the ordinals of the row keys in rows"""
+        mask = bytearray(len(self.row_keys) // 8 + 1)
+        for row in rows:
+            ordinal = self.rows.get(row)
+            if ordinal is not None:
+                mask[ordinal >> 3] |= 1 << (ordinal & 7)
+        return int.from_bytes(mask, "little")
+
+    def rows_of(self, bits):
+        """returns the list of the row keys whose ordinals are set in bits"""
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        return [self.row_keys[i << 3 | bit] for i, byte in enumerate(data)
+                if byte for bit in positions[byte]]
+
+    def counts(self, bits=None):
+        """returns the number of rows set in bits, or of all rows, by column"""
+        found = {}
+        for position, column in enumerate(self.column_ids):
+            rows = int.from_bytes(self.bitsets[position], "little")
+            rows = count(rows & bits if bits is not None else rows)
+            if rows:
+                found[column] = rows
+        return found
+
+    def __positions(self, mask):
+        """yields the positions of the bits set in mask"""
+        position = 0
+        while mask:
+            if mask & 1:
+                yield position
+            mask >>= 1
+            position += 1
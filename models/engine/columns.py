@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+"""
+Contains the ColumnStore class, raw records kept column by column
+"""
+
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from models.base_model import format_time
+
+# datetime - origin of the microsecond counts of the datetime columns
+epoch = datetime(1970, 1, 1)
+# tuple - attributes stored as microsecond counts
+datetimes = ("created_at", "updated_at")
+# object - marks the cells of a column a record has no value for
+missing = object()
+
+
+def microseconds(value):
+    """returns the microseconds since epoch of a to_dict() date, or None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or format_time(parsed) != value:
+        return None
+    return (parsed - epoch) // timedelta(microseconds=1)
+
+
+class Column:
+    """
+    The values of one attribute, as a typed array while they all fit:
+    q for integers and datetimes, d for floats, I for the codes of a
+    dictionary of strings, or a plain list once they do not
+    """
+
+    def __init__(self, kind):
+        """Instantiate an empty column of kind int, float, date or code"""
+        self.kind = kind
+        self.cells = array({"int": "q", "float": "d", "date": "q",
+                            "code": "I"}[kind])
+        self.strings = []
+        self.codes = {}
+
+    def encode(self, value):
+        """returns value as stored in the cells, or None if it does not fit"""
+        if self.kind == "int":
+            if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+                return value
+        elif self.kind == "float":
+            if type(value) is float:
+                return value
+        elif self.kind == "date":
+            return microseconds(value)
+        elif type(value) is str:
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.strings)
+                self.strings.append(value)
+            return code
+        return None
+
+    def decode(self, cell):
+        """returns the value stored as cell"""
+        if self.kind == "date":
+            return format_time(epoch + timedelta(microseconds=cell))
+        if self.kind == "code":
+            return self.strings[cell]
+        return cell
+
+    def values(self):
+        """returns the list of the values of every cell"""
+        return [self.decode(cell) for cell in self.cells]
+
+
+class ColumnStore(MutableMapping):
+    """
+    Mapping of <class name>.id to raw records, each class kept as one
+    array or list per attribute: numbers and dates in typed arrays,
+    foreign keys as codes of a dictionary of their distinct values and
+    lists of ids as tuples sharing one copy of each id
+    """
+
+    def __init__(self):
+        """Instantiate an empty store"""
+        self.tables = {}
+        self.rows = {}
+
+    def __len__(self):
+        """returns the number of records stored"""
+        return len(self.rows)
+
+    def __iter__(self):
+        """iterates over the keys of the records stored"""
+        return iter(self.rows)
+
+    def __contains__(self, key):
+        """returns True if a record is stored under key"""
+        return key in self.rows
+
+    def __getitem__(self, key):
+        """returns a new dictionary holding the record stored under key"""
+        row = self.rows[key]
+        table = self.tables[key.partition(".")[0]]
+        if row in table["extras"]:
+            return dict(table["extras"][row])
+        record = {}
+        for attr, column in table["columns"].items():
+            cell = column[row] if isinstance(column, list) \
+                else column.decode(column.cells[row])
+            if type(cell) is tuple:
+                cell = list(cell)
+            if cell is not missing:
+                record[attr] = cell
+        record["id"] = key.partition(".")[2]
+        return record
+
+    def __setitem__(self, key, record):
+        """stores record under key, replacing the previous one"""
+        self.pop(key, None)
+        name, _, id = key.partition(".")
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = {"columns": {}, "size": 0,
+                                         "free": [], "extras": {},
+                                         "strings": {}}
+        columns = table["columns"]
+        if table["free"]:
+            row = table["free"].pop()
+        else:
+            row = table["size"]
+            table["size"] += 1
+            for column in columns.values():
+                if isinstance(column, list):
+                    column.append(missing)
+                else:
+                    column.cells.append(0)
+        self.rows[key] = row
+        if record.get("id") != id:
+            table["extras"][row] = dict(record)
+            return
+        alone = table["size"] - len(table["free"]) == 1
+        for attr, value in record.items():
+            if attr != "id" and attr not in columns:
+                column = self.__column(attr, value)
+                if isinstance(column, list) or not alone:
+                    column = [missing] * table["size"]
+                else:
+                    column.cells.extend([0] * table["size"])
+                columns[attr] = column
+        strings = table["strings"]
+        for attr in list(columns):
+            value = record.get(attr, missing)
+            if type(value) is list and all(type(item) is str
+                                           for item in value):
+                value = tuple(strings.setdefault(item, item)
+                              for item in value)
+            self.__put(table, attr, row, value)
+
+    def __delitem__(self, key):
+        """removes the record stored under key"""
+        if self.pop(key, missing) is missing:
+            raise KeyError(key)
+
+    def pop(self, key, default=missing):
+        """removes the record stored under key and returns it"""
+        if key not in self.rows:
+            if default is missing:
+                raise KeyError(key)
+            return default
+        record = self[key]
+        row = self.rows.pop(key)
+        table = self.tables[key.partition(".")[0]]
+        table["extras"].pop(row, None)
+        for attr, column in table["columns"].items():
+            if isinstance(column, list):
+                column[row] = missing
+        table["free"].append(row)
+        return record
+
+    def __column(self, attr, value):
+        """returns the empty column best suited to the values of attr"""
+        if attr in datetimes:
+            return Column("date")
+        if type(value) is int:
+            return Column("int")
+        if type(value) is float:
+            return Column("float")
+        if attr.endswith("_id") or attr == "__class__":
+            return Column("code")
+        return []
+
+    def __put(self, table, attr, row, value):
+        """stores value in the cell row of the column attr"""
+        column = table["columns"][attr]
+        if not isinstance(column, list):
+            cell = column.encode(value) if value is not missing else None
+            if cell is not None:
+                column.cells[row] = cell
+                return
+            column = table["columns"][attr] = column.values()
+        column[row] = value
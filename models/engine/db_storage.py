@@ -5,38 +5,81 @@ Contains the class DBStorage
 
 import models
 from models.amenity import Amenity
-from models.base_model import BaseModel, Base
+from models.base_model import BaseModel, Base, parse_time
 from models.city import City
+from models.engine.geo import boxes, nearest
+from models.engine.query import conditions, sort_keys
+from models.engine.text import TextIndex, document, searchable
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+import operator
 from os import getenv
 import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import and_, create_engine, event, exists, func, literal
+from sqlalchemy import insert, or_, select, union_all
+from sqlalchemy.orm import aliased, scoped_session, sessionmaker
+
+sql_operators = {"==": operator.eq, "!=": operator.ne, "<": operator.lt,
+                 "<=": operator.le, ">": operator.gt, ">=": operator.ge}
 
 classes = {"Amenity": Amenity, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# list - class names in an order inserting them never breaks a foreign key
+insert_order = ["State", "City", "User", "Amenity", "Place", "Review"]
+
+
+def column_default(column):
+    """returns the value inserted in column when a row leaves it out"""
+    default = column.default
+    if default is None or default.is_sequence or default.is_clause_element:
+        return None
+    if default.is_callable:
+        return default.arg(None)
+    return default.arg
+
+
+def sqlite_foreign_keys(dbapi_connection, connection_record):
+    """turns on foreign key enforcement, which SQLite leaves off"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
 
 
 class DBStorage:
     """interaacts with the MySQL database"""
     __engine = None
     __session = None
+    # TextIndex - full-text index of the searchable texts, built on demand
+    __text = None
 
-    def __init__(self):
-        """Instantiate a DBStorage object"""
+    def __init__(self, url=None, index_path=None):
+        """
+        Instantiate a DBStorage object, on MySQL unless url is given,
+        persisting its full-text index to index_path
+        """
         HBNB_MYSQL_USER = getenv('HBNB_MYSQL_USER')
         HBNB_MYSQL_PWD = getenv('HBNB_MYSQL_PWD')
         HBNB_MYSQL_HOST = getenv('HBNB_MYSQL_HOST')
         HBNB_MYSQL_DB = getenv('HBNB_MYSQL_DB')
         HBNB_ENV = getenv('HBNB_ENV')
-        self.__engine = create_engine('mysql+mysqldb://{}:{}@{}/{}'.
-                                      format(HBNB_MYSQL_USER,
-                                             HBNB_MYSQL_PWD,
-                                             HBNB_MYSQL_HOST,
-                                             HBNB_MYSQL_DB))
+        if url is None:
+            url = 'mysql+mysqldb://{}:{}@{}/{}'.format(HBNB_MYSQL_USER,
+                                                       HBNB_MYSQL_PWD,
+                                                       HBNB_MYSQL_HOST,
+                                                       HBNB_MYSQL_DB)
+        self.__engine = create_engine(url)
+        self.__text_path = index_path or getenv('HBNB_SEARCH_INDEX',
+                                                'hbnb.search')
+        self.__bulk = {}
+        # dictionary - latest updated_at of each searchable class when the
+        # text index was last synced with the database
+        self.__marks = {}
+        # boolean - the session was closed since the text index was synced
+        self.__stale = False
+        if self.__engine.dialect.name == "sqlite":
+            event.listen(self.__engine, "connect", sqlite_foreign_keys)
         if HBNB_ENV == "test":
             Base.metadata.drop_all(self.__engine)
 
@@ -51,6 +94,271 @@ class DBStorage:
                     new_dict[key] = obj
         return (new_dict)
 
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0):
+        """
+        This method retrieves the objects of a class matching conditions
+        cls: class
+        where: dictionary of attribute: value, or attribute: (operator, value)
+               with operator one of ==, !=, <, <=, >, >=, in, between
+        order_by: attribute name or list of names, prefixed by - to reverse
+        limit: maximum number of objects returned (optional)
+        offset: number of matching objects skipped
+        Returns the list of matching objects, filtered and sorted in SQL
+        """
+        query = self.__select(cls, where, order_by)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def page(self, cls, where=None, limit=None, after=None):
+        """
+        This method retrieves a page of objects of a class by creation order
+        cls: class
+        where: conditions on the objects, as for query()
+        limit: maximum number of objects returned (optional)
+        after: (created_at, id) of the last object of the previous page,
+               with created_at formatted like to_dict() does
+        Returns the list of matching objects ordered by created_at then id
+        """
+        if isinstance(cls, str):
+            cls = classes[cls]
+        query = self.__select(cls, where, ["created_at", "id"])
+        if after:
+            query = query.filter(self.__after(cls, after))
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def search_places(self, states=None, cities=None, amenities=None,
+                      limit=None, after=None, where=None, sort=None):
+        """
+        This method searches places by location and amenities
+        states: ids of states whose places are included
+        cities: ids of cities whose places are included
+                (all places if neither states nor cities match any place)
+        amenities: ids of amenities all the places must have
+        limit: maximum number of places returned (optional)
+        after: (created_at, id) of the last place of the previous page,
+               or (value, id) when sorted
+        where: conditions on the places, as for query()
+        sort: numeric attribute to sort by, prefixed by - to reverse
+        Returns the list of matching places ordered by sort, or by
+        created_at, then id, selected by a single SQL statement
+        """
+        query = self.__searched(states, cities, amenities, where)
+        if sort is None:
+            if after:
+                query = query.filter(self.__after(Place, after))
+            query = query.order_by(Place.created_at, Place.id)
+        else:
+            name, descending = sort_keys(sort)[0]
+            column = getattr(Place, name)
+            if after:
+                query = query.filter(
+                    self.__past(Place, column, after, descending))
+            query = query.order_by(
+                *[c.desc() if descending else c for c in (column, Place.id)])
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def facet_places(self, states=None, cities=None, amenities=None,
+                     where=None):
+        """
+        This method counts the places a search finds by facet
+        states, cities, amenities, where: the search, as for search_places()
+        Returns the number of places found by amenity, city and state id,
+        as {"amenities": {id: count}, "cities": {...}, "states": {...}},
+        counted by a single SQL statement
+        """
+        found = self.__searched(states, cities, amenities, where)
+        found = found.with_entities(Place.id, Place.city_id).cte("found")
+        place_amenity = Base.metadata.tables["place_amenity"]
+        by_amenity = select(literal("amenities"), place_amenity.c.amenity_id,
+                            func.count()).join_from(
+            found, place_amenity, place_amenity.c.place_id == found.c.id
+        ).group_by(place_amenity.c.amenity_id)
+        by_city = select(literal("cities"), found.c.city_id,
+                         func.count()).group_by(found.c.city_id)
+        by_state = select(literal("states"), City.state_id,
+                          func.count()).join_from(
+            found, City, City.id == found.c.city_id).group_by(City.state_id)
+        facets = {"amenities": {}, "cities": {}, "states": {}}
+        for facet, id, count in self.__session.execute(
+                union_all(by_amenity, by_city, by_state)):
+            facets[facet][id] = count
+        return facets
+
+    def __searched(self, states, cities, amenities, where):
+        """returns the query of the places a search matches, unordered"""
+        state_ids = list(set(states or ()))
+        city_ids = list(set(cities or ()))
+        amenity_ids = list(set(amenities or ()))
+        query = self.__filter(self.__session.query(Place), Place, where)
+        if state_ids or city_ids:
+            place, city = aliased(Place), aliased(City)
+            located = or_(place.city_id.in_(city_ids),
+                          city.state_id.in_(state_ids))
+            any_located = exists().where(place.city_id == city.id, located)
+            query = query.join(City, Place.city_id == City.id).filter(
+                or_(Place.city_id.in_(city_ids), City.state_id.in_(state_ids),
+                    ~any_located))
+        if amenity_ids:
+            place_amenity = Base.metadata.tables["place_amenity"]
+            query = query.join(place_amenity,
+                               place_amenity.c.place_id == Place.id).filter(
+                place_amenity.c.amenity_id.in_(amenity_ids)).group_by(
+                Place.id).having(func.count() == len(amenity_ids))
+        return query
+
+    def places_within(self, south, west, north, east, limit=None):
+        """
+        This method retrieves the places inside a bounding box
+        south, north: latitudes bounding the box
+        west, east: longitudes bounding the box, west > east if the box
+                    crosses the antimeridian
+        limit: maximum number of places returned (optional)
+        Returns the list of places ordered by created_at then id
+        """
+        query = self.__session.query(Place).filter(
+            self.__inside(south, west, north, east))
+        query = query.order_by(Place.created_at, Place.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def nearest_places(self, latitude, longitude, k=10, radius=None):
+        """
+        This method retrieves the places nearest to a point
+        latitude, longitude: coordinates of the point
+        k: maximum number of places returned (optional)
+        radius: maximum distance in kilometers (optional)
+        Returns the list of (place, distance in kilometers) by distance
+        """
+        def search(south, west, north, east):
+            """returns the (id, latitude, longitude) of places in a box"""
+            return self.__session.query(
+                Place.id, Place.latitude, Place.longitude).filter(
+                self.__inside(south, west, north, east)).all()
+        found = nearest(search, latitude, longitude, k, radius)
+        places = {}
+        if found:
+            places = {place.id: place for place in self.__session.query(
+                Place).filter(Place.id.in_([id for dist, id in found]))}
+        return [(places[id], dist) for dist, id in found]
+
+    def __inside(self, south, west, north, east):
+        """returns the condition selecting the places inside a box"""
+        return or_(*[and_(Place.latitude.between(box[0], box[2]),
+                          Place.longitude.between(box[1], box[3]))
+                     for box in boxes(south, west, north, east)])
+
+    def search(self, text, cls=None, limit=10):
+        """
+        This method searches the places and reviews by their text
+        text: words searched, ranked by BM25
+        cls: class, Place or Review, searched (optional)
+        limit: maximum number of objects returned (optional)
+        Returns the list of (object, score) by decreasing score
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        found = self.__text_index().search(
+            text, limit, cls + "." if cls is not None else None)
+        objs = {}
+        for name in searchable:
+            ids = [key.partition(".")[2] for key, score in found
+                   if key.partition(".")[0] == name]
+            if ids:
+                query = self.__session.query(classes[name]).filter(
+                    classes[name].id.in_(ids))
+                objs.update((name + "." + obj.id, obj) for obj in query)
+        return [(objs[key], score) for key, score in found if key in objs]
+
+    def __text_index(self):
+        """returns the full-text index, loading or building it if needed"""
+        if self.__text is None:
+            self.__marks = self.__watermarks()
+            index = TextIndex.load(self.__text_path)
+            if index.sync(self.__documents()):
+                index.save(self.__text_path)
+            self.__text = index
+        elif self.__stale:
+            self.__resync()
+        self.__stale = False
+        return self.__text
+
+    def __watermarks(self):
+        """returns the latest updated_at of each searchable class"""
+        return {name: self.__session.query(
+                    func.max(classes[name].updated_at)).scalar()
+                for name in searchable}
+
+    def __documents(self, since=None):
+        """
+        yields the (key, text) of the searchable rows, or only of the rows
+        updated since the updated_at of their class in since
+        """
+        for name, attrs in searchable.items():
+            cls = classes[name]
+            query = self.__session.query(
+                cls.id, *[getattr(cls, attr) for attr in attrs])
+            if since is not None and since.get(name) is not None:
+                query = query.filter(cls.updated_at >= since[name])
+            for row in query:
+                yield (name + "." + row[0],
+                       document(dict(zip(attrs, row[1:])), name))
+
+    def __resync(self):
+        """
+        applies to the text index the rows other processes wrote: the rows
+        updated since its watermarks, then every row if the number of rows
+        no longer matches the index, which catches deletions and inserts
+        that kept an older updated_at
+        """
+        marks = self.__watermarks()
+        for key, text in self.__documents(self.__marks):
+            self.__text.add(key, text)
+        self.__marks = marks
+        if sum(self.count(name) for name in searchable) != len(self.__text):
+            self.__text.sync(self.__documents())
+
+    def __after(self, cls, after):
+        """returns the condition selecting the rows of cls after a cursor"""
+        created_at = parse_time(after[0])
+        return self.__past(cls, cls.created_at, (created_at, after[1]))
+
+    def __past(self, cls, column, after, descending=False):
+        """returns the condition selecting the rows past a (value, id)"""
+        value, id = after
+        if descending:
+            return or_(column < value, and_(column == value, cls.id < id))
+        return or_(column > value, and_(column == value, cls.id > id))
+
+    def __select(self, cls, where=None, order_by=None):
+        """returns the query of the rows of cls matching where, sorted"""
+        if isinstance(cls, str):
+            cls = classes[cls]
+        query = self.__filter(self.__session.query(cls), cls, where)
+        for name, descending in sort_keys(order_by):
+            column = getattr(cls, name)
+            query = query.order_by(column.desc() if descending else column)
+        return query
+
+    def __filter(self, query, cls, where=None):
+        """returns query narrowed down to the rows of cls matching where"""
+        for name, op, value in conditions(where):
+            column = getattr(cls, name)
+            if op == "in":
+                query = query.filter(column.in_(list(value)))
+            elif op == "between":
+                query = query.filter(column.between(value[0], value[1]))
+            else:
+                query = query.filter(sql_operators[op](column, value))
+        return query
+
     def new(self, obj):
         """add the object to the current database session"""
         self.__session.add(obj)
@@ -59,6 +367,66 @@ class DBStorage:
         """commit all changes of the current database session"""
         self.__session.commit()
 
+    def rollback(self):
+        """discards the changes of the current database session"""
+        self.__session.rollback()
+
+    def bulk_new(self, objs):
+        """queues objs to be inserted by the next bulk_save()"""
+        for obj in objs:
+            self.__bulk.setdefault(obj.__class__.__name__, []).append(obj)
+
+    def bulk_save(self, chunk=10000, amenities=False):
+        """
+        This method inserts the objects queued by bulk_new() in one
+        transaction, with executemany INSERTs instead of the unit of work:
+        the objects are neither added to the session nor refreshed, and
+        the columns an object leaves unset get their default or NULL
+        chunk: maximum number of rows sent by one statement
+        amenities: also inserts the place_amenity rows of the places,
+                   from their amenities and amenity_ids
+        Returns the number of objects inserted
+        """
+        queued, self.__bulk = self.__bulk, {}
+        count = 0
+        links = []
+        try:
+            for name in insert_order:
+                objs = queued.get(name, [])
+                table = classes[name].__table__
+                columns = table.columns.keys()
+                for i in range(0, len(objs), chunk):
+                    rows = [{column: obj.__dict__[column]
+                             if column in obj.__dict__ else
+                             column_default(table.columns[column])
+                             for column in columns}
+                            for obj in objs[i:i + chunk]]
+                    self.__session.execute(insert(classes[name]), rows)
+                count += len(objs)
+                if name in searchable:
+                    self.__pending(self.__session()).update(
+                        (name + "." + obj.id, document(obj, name))
+                        for obj in objs)
+                if name == "Place" and amenities:
+                    links = [{"place_id": obj.id, "amenity_id": id}
+                             for obj in objs for id in self.__links(obj)]
+            for i in range(0, len(links), chunk):
+                self.__session.execute(insert(Base.metadata.tables[
+                    "place_amenity"]),
+                                       links[i:i + chunk])
+            self.__session.commit()
+        except Exception:
+            self.__session.rollback()
+            raise
+        return count
+
+    def __links(self, place):
+        """returns the ids of the amenities and amenity_ids of a place"""
+        ids = [amenity.id for amenity in place.__dict__.get("amenities", [])]
+        ids += [id for id in place.__dict__.get("amenity_ids", [])
+                if id not in ids]
+        return ids
+
     def delete(self, obj=None):
         """delete from the current database session obj if not None"""
         if obj is not None:
@@ -68,12 +436,53 @@ class DBStorage:
         """reloads data from the database"""
         Base.metadata.create_all(self.__engine)
         sess_factory = sessionmaker(bind=self.__engine, expire_on_commit=False)
+        event.listen(sess_factory, "after_flush", self.__flushed)
+        event.listen(sess_factory, "after_commit", self.__committed)
+        event.listen(sess_factory, "after_rollback", self.__rolled_back)
         Session = scoped_session(sess_factory)
         self.__session = Session
 
+    def __pending(self, session):
+        """
+        returns the dictionary of the searchable texts session wrote and has
+        not committed yet, by key, None for the deleted objects: each thread
+        has its own session, so it only commits or forgets its own texts
+        """
+        return session.info.setdefault("pending_texts", {})
+
+    def __flushed(self, session, flush_context):
+        """remembers the searchable texts written by a flush"""
+        pending = self.__pending(session)
+        for obj in list(session.new) + list(session.dirty):
+            name = obj.__class__.__name__
+            if name in searchable:
+                pending[name + "." + obj.id] = document(obj, name)
+        for obj in session.deleted:
+            name = obj.__class__.__name__
+            if name in searchable:
+                pending[name + "." + obj.id] = None
+
+    def __committed(self, session):
+        """applies the texts of the committed flushes to the text index"""
+        pending = session.info.pop("pending_texts", {})
+        if self.__text is not None:
+            for key, text in pending.items():
+                if text is None:
+                    self.__text.remove(key)
+                else:
+                    self.__text.add(key, text)
+
+    def __rolled_back(self, session):
+        """forgets the texts of the flushes rolled back"""
+        session.info.pop("pending_texts", None)
+
     def close(self):
-        """call remove() method on the private session attribute"""
+        """
+        call remove() method on the private session attribute, the text
+        index is resynced with the database before its next search
+        """
         self.__session.remove()
+        self.__stale = True
 
     def get(self, cls, id):
         """
@@ -82,8 +491,11 @@ class DBStorage:
         id: string representing the object ID
         Returns the object based on the class and its ID, or None if not found
         """
-        cls_objs = self.all(cls)
-        return cls_objs.get(cls.__name__ + '.' + id)
+        if isinstance(cls, str):
+            cls = classes.get(cls)
+        if cls not in classes.values() or id is None:
+            return None
+        return self.__session.get(cls, id)
 
     def count(self, cls=None):
         """
@@ -92,5 +504,11 @@ class DBStorage:
         Returns the number of objects in storage matching the given class.
         If no class is passed, returns the count of all objects in storage.
         """
-        cls_objs = self.all(cls)
-        return len(cls_objs)
+        counts = []
+        for clss in classes:
+            if cls is None or cls is classes[clss] or cls == clss:
+                counts.append(select(func.count()).select_from(classes[clss])
+                              .scalar_subquery())
+        if not counts:
+            return 0
+        return sum(self.__session.execute(select(*counts)).one())
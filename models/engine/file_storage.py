@@ -3,17 +3,74 @@
 Contains the FileStorage class
 """
 
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+import fcntl
 import json
 from models.amenity import Amenity
-from models.base_model import BaseModel
+from models.base_model import BaseModel, format_time, parse_time
 from models.city import City
+from models.engine.bitmap import Bitmap
+from models.engine.columns import ColumnStore
+from models.engine.geo import GridIndex, boxes, nearest
+from models.engine.query import conditions, matches, ordered, sort_keys
+from models.engine.query import window
+from models.engine.text import TextIndex, document, searchable
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
+import os
+from weakref import WeakValueDictionary
 
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
+# string - sorts after any id, bounds the (value, id) ranges searched
+last = chr(0x10ffff)
+# object - amenity_ids of a stored place, whose ids the amenity bitmap keeps
+in_bitmap = object()
+
+
+def changing(method):
+    """returns the list method calling changed() once done"""
+    def change(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.changed()
+        return result
+    change.__doc__ = method.__doc__
+    return change
+
+
+class LinkedIds(list):
+    """
+    amenity_ids of a stored place read from the amenity bitmap, setting
+    the attribute of the place when changed in place
+    """
+    __slots__ = ("place",)
+
+    def __init__(self, ids, place):
+        """keeps ids and the place they belong to"""
+        super().__init__(ids)
+        self.place = place
+
+    def changed(self):
+        """sets the ids as the amenity_ids of the place"""
+        setattr(self.place, "amenity_ids", list(self))
+
+    append = changing(list.append)
+    extend = changing(list.extend)
+    insert = changing(list.insert)
+    remove = changing(list.remove)
+    pop = changing(list.pop)
+    clear = changing(list.clear)
+    sort = changing(list.sort)
+    reverse = changing(list.reverse)
+    __setitem__ = changing(list.__setitem__)
+    __delitem__ = changing(list.__delitem__)
+    __iadd__ = changing(list.__iadd__)
+    __imul__ = changing(list.__imul__)
 
 
 class FileStorage:
@@ -23,52 +80,1019 @@ class FileStorage:
     __file_path = "file.json"
     # dictionary - empty but will store all objects by <class name>.id
     __objects = {}
+    # boolean - append changes to a journal instead of rewriting the file
+    __journal = os.getenv("HBNB_FILE_JOURNAL") == "1"
+    # integer - journal size in bytes past which the file is compacted
+    __journal_limit = int(os.getenv("HBNB_FILE_JOURNAL_LIMIT", 4194304))
+    # set - keys of the objects created, changed or deleted since save()
+    __dirty = set()
+    # set - keys of the objects deleted with delete() since save()
+    __deleted = set()
+    # integer - number of objects added by bulk_new() since bulk_save()
+    __bulked = 0
+    # OrderedDict - (object, to_dict() result) of the unchanged objects by
+    # key, the least recently used first
+    __serialized = OrderedDict()
+    # integer - number of to_dict() results kept in __serialized
+    __serialized_limit = int(os.getenv("HBNB_FILE_CACHE_SIZE", 1024))
+    # dictionary - (object, JSON text) of the unchanged objects by key, the
+    # object None for a raw record
+    __fragments = {}
+    # tuple - inode, size and mtime of the JSON file when last read/written
+    __snapshot = None
+    # tuple - inode of the journal and offset up to which it was applied
+    __journal_at = None
+    # boolean - keep the raw records in per-class columns, implies __lazy
+    __columnar = os.getenv("HBNB_FILE_COLUMNAR") == "1"
+    # boolean - keep reloaded records raw until their object is accessed
+    __lazy = os.getenv("HBNB_FILE_LAZY") == "1" or __columnar
+    # dictionary - raw records not materialized yet by <class name>.id
+    __records = ColumnStore() if __columnar else {}
+    # WeakValueDictionary - objects built from columnar records by key,
+    # dropped once unused while unchanged
+    __views = WeakValueDictionary()
+    # dictionary - the objects partitioned by class name, None if still raw
+    __by_class = {}
+    # dictionary - foreign key attributes indexed for each class name
+    __foreign_keys = {"City": ("state_id",),
+                      "Place": ("city_id", "user_id"),
+                      "Review": ("place_id", "user_id")}
+    # dictionary - keys of the objects by value of each foreign key
+    # attribute of each class name, built on demand
+    __references = {}
+    # dictionary - foreign key values each object is indexed under by key
+    __referenced = {}
+    # dictionary - sorted (created_at, id) of each class, built on demand
+    __ordered = {}
+    # dictionary - created_at each key is ordered under in __ordered
+    __created = {}
+    # dictionary - numeric attributes kept in sorted indexes for each class
+    __numeric = {"Place": ("price_by_night", "max_guest", "number_rooms",
+                           "number_bathrooms")}
+    # dictionary - sorted (value, id) by numeric attribute of each class
+    # name, built on demand
+    __sorted = {}
+    # dictionary - numeric values each object is sorted under by key
+    __valued = {}
+    # Bitmap - amenities of each place, places by ordinal and amenities by bit
+    __amenities = Bitmap()
+    # GridIndex - places bucketed by their latitude and longitude, built on
+    # demand
+    __grid = None
+    # TextIndex - full-text index of the searchable texts, built on demand
+    __text = None
+    # dictionary - the __objects dictionary the indexes were built from
+    __indexed = None
+
+    def __partitions(self):
+        """returns __by_class, rebuilding the indexes if __objects changed"""
+        if FileStorage.__indexed is not FileStorage.__objects:
+            for objects in (FileStorage.__indexed or {}, FileStorage.__views,
+                            FileStorage.__objects):
+                for key, obj in list(objects.items()):
+                    self.__detach(key, obj)
+            FileStorage.__by_class = {}
+            FileStorage.__references = {}
+            FileStorage.__referenced = {}
+            FileStorage.__ordered = {}
+            FileStorage.__created = {}
+            FileStorage.__sorted = {}
+            FileStorage.__valued = {}
+            FileStorage.__amenities = Bitmap()
+            FileStorage.__grid = None
+            FileStorage.__text = None
+            FileStorage.__views = WeakValueDictionary()
+            FileStorage.__indexed = FileStorage.__objects
+            for key, obj in FileStorage.__objects.items():
+                self.__index(key, obj)
+            for key, record in FileStorage.__records.items():
+                self.__index(key, None, record)
+        return FileStorage.__by_class
+
+    def __index(self, key, obj, record=None):
+        """adds obj, or the raw record, to its class partition and indexes"""
+        name = key.partition(".")[0]
+        FileStorage.__by_class.setdefault(name, {})[key] = obj
+        if name in FileStorage.__references:
+            self.__reference(key, obj if obj is not None else record)
+        if name in FileStorage.__sorted:
+            self.__rank(key, obj if obj is not None else record)
+        if name == "Place":
+            self.__link(key, obj if obj is not None else record)
+            if FileStorage.__grid is not None:
+                self.__locate(key, obj if obj is not None else record)
+        if name in FileStorage.__ordered:
+            self.__order(key, obj if obj is not None else record)
+        if name in searchable and FileStorage.__text is not None:
+            FileStorage.__text.add(key, document(obj if obj is not None
+                                                 else record, name))
+
+    def __reference(self, key, source):
+        """indexes key under the foreign key values of an object or record"""
+        name = key.partition(".")[0]
+        attrs = self.__foreign_keys.get(name, ())
+        if not attrs:
+            return
+        if isinstance(source, dict):
+            values = [source.get(attr, getattr(classes[name], attr))
+                      for attr in attrs]
+        else:
+            values = [getattr(source, attr, None) for attr in attrs]
+        values = tuple(tuple(value) if isinstance(value, list) else value
+                       for value in values)
+        for attr, value in zip(attrs, values):
+            index = FileStorage.__references[name][attr]
+            for item in value if isinstance(value, tuple) else (value,):
+                index.setdefault(item, {})[key] = None
+        FileStorage.__referenced[key] = values
+
+    def __unreference(self, key):
+        """removes key from the foreign key indexes it is listed in"""
+        name = key.partition(".")[0]
+        values = FileStorage.__referenced.pop(key, ())
+        for attr, value in zip(self.__foreign_keys.get(name, ()), values):
+            index = FileStorage.__references[name][attr]
+            for item in value if isinstance(value, tuple) else (value,):
+                keys = index.get(item, {})
+                keys.pop(key, None)
+                if not keys:
+                    index.pop(item, None)
+
+    def __references_of(self, name):
+        """
+        returns the foreign key indexes of a class by attribute, indexing
+        its objects the first time they are used
+        """
+        partitions = self.__partitions()
+        if name not in FileStorage.__references:
+            FileStorage.__references[name] = {
+                attr: {} for attr in self.__foreign_keys.get(name, ())}
+            for key, obj in partitions.get(name, {}).items():
+                self.__reference(key, obj if obj is not None
+                                 else FileStorage.__records[key])
+        return FileStorage.__references[name]
+
+    def __values(self, key, source):
+        """returns the numeric values of an object or record, or None"""
+        name = key.partition(".")[0]
+        attrs = self.__numeric.get(name, ())
+        if isinstance(source, dict):
+            values = [source.get(attr, getattr(classes[name], attr))
+                      for attr in attrs]
+        else:
+            values = [getattr(source, attr, None) for attr in attrs]
+        return tuple(value if self.__is_number(value) else None
+                     for value in values)
+
+    def __rank(self, key, source):
+        """inserts key in the sorted indexes of its numeric attributes"""
+        name, _, id = key.partition(".")
+        values = self.__values(key, source)
+        for attr, value in zip(self.__numeric.get(name, ()), values):
+            if value is not None:
+                insort(FileStorage.__sorted[name][attr], (value, id))
+        FileStorage.__valued[key] = values
+
+    def __unrank(self, key):
+        """removes key from the sorted indexes it is listed in"""
+        name, _, id = key.partition(".")
+        values = FileStorage.__valued.pop(key, ())
+        for attr, value in zip(self.__numeric.get(name, ()), values):
+            if value is None:
+                continue
+            index = FileStorage.__sorted[name][attr]
+            i = bisect_left(index, (value, id))
+            if i < len(index) and index[i] == (value, id):
+                del index[i]
+
+    def __sorted_of(self, name):
+        """
+        returns the sorted indexes of the numeric attributes of a class,
+        sorting each of them once the first time they are used
+        """
+        partitions = self.__partitions()
+        if name not in FileStorage.__sorted:
+            attrs = self.__numeric.get(name, ())
+            indexes = {attr: [] for attr in attrs}
+            for key, obj in partitions.get(name, {}).items():
+                values = self.__values(key, obj if obj is not None
+                                       else FileStorage.__records[key])
+                id = key.partition(".")[2]
+                for attr, value in zip(attrs, values):
+                    if value is not None:
+                        indexes[attr].append((value, id))
+                FileStorage.__valued[key] = values
+            for index in indexes.values():
+                index.sort()
+            FileStorage.__sorted[name] = indexes
+        return FileStorage.__sorted[name]
+
+    def __is_number(self, value):
+        """returns True if value can be kept in a sorted index"""
+        return isinstance(value, (int, float)) and \
+            not isinstance(value, bool) and value == value
+
+    def __range(self, cls, name, op, value):
+        """returns the keys of cls satisfying a numeric condition, or None"""
+        if op == "between":
+            low, high = value
+        elif op in (">", ">="):
+            low, high = value, None
+        elif op in ("<", "<="):
+            low, high = None, value
+        elif op == "==":
+            low, high = value, value
+        else:
+            return None
+        if any(bound is not None and not self.__is_number(bound)
+               for bound in (low, high)):
+            return None
+        index = self.__sorted_of(cls).get(name, [])
+        start, stop = 0, len(index)
+        if low is not None:
+            start = bisect_left(index, (low, last) if op == ">" else (low,))
+        if high is not None:
+            stop = bisect_left(index, (high,) if op == "<" else (high, last))
+        return [cls + "." + id for value, id in index[start:stop]]
+
+    def __link(self, key, source):
+        """
+        sets the amenities of the place key in the amenity bitmap; a
+        record keeps its amenity_ids list, holding the ids kept by the
+        bitmap so the places share one copy of each amenity id, a place
+        keeps none
+        """
+        if isinstance(source, dict):
+            amenity_ids = source.get("amenity_ids", [])
+        else:
+            amenity_ids = source.__dict__.get("amenity_ids", [])
+        if not isinstance(amenity_ids, (list, tuple)):
+            amenity_ids = []
+        shared = FileStorage.__amenities.set(key, amenity_ids)
+        if not isinstance(source, dict):
+            self.__attach(source)
+        elif isinstance(amenity_ids, list) and amenity_ids:
+            list.__setitem__(amenity_ids, slice(None), shared)
+
+    def __attach(self, place):
+        """
+        drops the amenity_ids list of a place stored and linked in the
+        amenity bitmap, amenity_ids then being read from the bitmap
+        """
+        if "amenity_ids" in place.__dict__:
+            place.__dict__["amenity_ids"] = in_bitmap
+
+    def __detach(self, key, obj):
+        """
+        gives back its own amenity_ids list, read from the amenity bitmap,
+        to a place no longer stored under key
+        """
+        if obj is not None and obj.__dict__.get("amenity_ids") is in_bitmap:
+            obj.__dict__["amenity_ids"] = \
+                FileStorage.__amenities.columns_of(key) or []
+
+    def __locate(self, key, source):
+        """
+        puts the place key in the grid at its latitude and longitude,
+        leaves it out if they were never set, as the NULL columns of the
+        database are
+        """
+        if not isinstance(source, dict):
+            source = source.__dict__
+        FileStorage.__grid.add(key, source.get("latitude"),
+                               source.get("longitude"))
+
+    def __grid_of(self):
+        """returns the grid of the places, building it the first time"""
+        partitions = self.__partitions()
+        if FileStorage.__grid is None:
+            FileStorage.__grid = GridIndex()
+            for key, obj in partitions.get("Place", {}).items():
+                self.__locate(key, obj if obj is not None
+                              else FileStorage.__records[key])
+        return FileStorage.__grid
+
+    def __created_at(self, source):
+        """returns the created_at of an object or record as a string"""
+        if isinstance(source, dict):
+            return source.get("created_at", "")
+        created = getattr(source, "created_at", "")
+        if isinstance(created, datetime):
+            created = format_time(created)
+        return created
+
+    def __order(self, key, source):
+        """inserts key in the creation order of its class"""
+        created = self.__created_at(source)
+        name, _, id = key.partition(".")
+        insort(FileStorage.__ordered[name], (created, id))
+        FileStorage.__created[key] = created
+
+    def __unorder(self, key):
+        """removes key from the creation order of its class"""
+        created = FileStorage.__created.pop(key, None)
+        if created is None:
+            return
+        name, _, id = key.partition(".")
+        ordered = FileStorage.__ordered[name]
+        i = bisect_left(ordered, (created, id))
+        if i < len(ordered) and ordered[i] == (created, id):
+            del ordered[i]
+
+    def __order_of(self, name):
+        """returns the creation order of a class, building it if needed"""
+        partitions = self.__partitions()
+        if name not in FileStorage.__ordered:
+            ordered = []
+            for key, obj in partitions.get(name, {}).items():
+                created = self.__created_at(obj if obj is not None
+                                            else FileStorage.__records[key])
+                ordered.append((created, key.partition(".")[2]))
+                FileStorage.__created[key] = created
+            ordered.sort()
+            FileStorage.__ordered[name] = ordered
+        return FileStorage.__ordered[name]
+
+    def __add(self, key, obj, record=None):
+        """stores obj, or the raw record if obj is None, and indexes it"""
+        self.__partitions()
+        if key in self.__objects or key in FileStorage.__records:
+            for old in (self.__objects.get(key),
+                        FileStorage.__views.get(key), obj):
+                self.__detach(key, old)
+            self.__unreference(key)
+            self.__unorder(key)
+            self.__unrank(key)
+            FileStorage.__amenities.remove(key)
+            if FileStorage.__grid is not None:
+                FileStorage.__grid.remove(key)
+            if FileStorage.__text is not None:
+                FileStorage.__text.remove(key)
+        self.__invalidate(key)
+        FileStorage.__deleted.discard(key)
+        FileStorage.__views.pop(key, None)
+        if obj is not None:
+            FileStorage.__records.pop(key, None)
+            self.__objects[key] = obj
+        else:
+            self.__objects.pop(key, None)
+            FileStorage.__records[key] = record
+        self.__index(key, obj, record)
+
+    def __remove(self, key):
+        """removes the object or record stored under key and unindexes it"""
+        partitions = self.__partitions()
+        self.__detach(key, self.__objects.pop(key, None))
+        FileStorage.__records.pop(key, None)
+        self.__detach(key, FileStorage.__views.pop(key, None))
+        partitions.get(key.partition(".")[0], {}).pop(key, None)
+        self.__unreference(key)
+        self.__unorder(key)
+        self.__unrank(key)
+        FileStorage.__amenities.remove(key)
+        if FileStorage.__grid is not None:
+            FileStorage.__grid.remove(key)
+        if FileStorage.__text is not None:
+            FileStorage.__text.remove(key)
+        self.__invalidate(key)
+
+    def __load(self, key, record):
+        """stores a record read from disk unless the object is up to date"""
+        obj = self.__objects.get(key)
+        if obj is not None:
+            if self.__matches(obj, record):
+                return
+        elif FileStorage.__records.get(key) == record:
+            return
+        if self.__lazy:
+            self.__add(key, None, record)
+        else:
+            self.__add(key, classes[record["__class__"]](**record))
+
+    def __matches(self, obj, record):
+        """
+        tells whether record is the to_dict() of obj without serializing
+        obj: parsing the two dates of record is much cheaper than formatting
+        those of obj, the amenity_ids of a stored place are compared with its
+        row of the amenity bitmap, the other attributes as they are
+        """
+        if record.get("__class__") != obj.__class__.__name__:
+            return False
+        attrs = dict(record)
+        del attrs["__class__"]
+        try:
+            for name in ("created_at", "updated_at"):
+                if name in attrs:
+                    attrs[name] = parse_time(attrs[name])
+        except (TypeError, ValueError):
+            return False
+        if obj.__dict__.get("amenity_ids") is in_bitmap:
+            amenity_ids = attrs.pop("amenity_ids", None)
+            columns = FileStorage.__amenities.columns_of(
+                "Place." + obj.id) or []
+            if not isinstance(amenity_ids, list) or \
+               len(amenity_ids) != len(columns) or \
+               set(amenity_ids) != set(columns):
+                return False
+            attrs["amenity_ids"] = in_bitmap
+        return attrs == obj.__dict__
+
+    def __fetch(self, key):
+        """
+        returns the object under key, materializing its raw record; in
+        columnar mode the record stays in its columns and the object is
+        only a view of it, kept while in use or once changed
+        """
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return obj
+        if self.__columnar:
+            obj = FileStorage.__views.get(key)
+            record = FileStorage.__records.get(key) if obj is None else None
+            if record is not None:
+                obj = classes[record["__class__"]](**record)
+                FileStorage.__views[key] = obj
+                if isinstance(obj, Place):
+                    self.__attach(obj)
+            return obj
+        record = FileStorage.__records.pop(key, None)
+        if record is None:
+            return None
+        obj = classes[record["__class__"]](**record)
+        if isinstance(obj, Place):
+            self.__attach(obj)
+        self.__objects[key] = obj
+        self.__partitions()[key.partition(".")[0]][key] = obj
+        self.__adopt(key, obj)
+        return obj
+
+    def __keep(self, key, obj):
+        """stores obj under key in place of its raw record, or of its view"""
+        partitions = self.__partitions()
+        FileStorage.__views.pop(key, None)
+        FileStorage.__records.pop(key, None)
+        self.__objects[key] = obj
+        partitions[key.partition(".")[0]][key] = obj
+        self.__adopt(key, obj)
+
+    def __adopt(self, key, obj):
+        """
+        keeps the JSON text of the raw record under key as that of obj,
+        built from the record and unchanged since
+        """
+        fragment = FileStorage.__fragments.get(key)
+        if fragment is not None and fragment[0] is None:
+            FileStorage.__fragments[key] = (obj, fragment[1])
+
+    def __invalidate(self, key):
+        """drops the cached serialized forms of the object under key"""
+        FileStorage.__serialized.pop(key, None)
+        FileStorage.__fragments.pop(key, None)
+
+    def touch(self, obj, name):
+        """marks obj as changed after its attribute name was set or deleted"""
+        if "id" not in obj.__dict__:
+            return
+        key = obj.__class__.__name__ + "." + obj.id
+        if self.__objects.get(key) is not obj:
+            if FileStorage.__views.get(key) is not obj:
+                return
+            self.__keep(key, obj)
+        FileStorage.__dirty.add(key)
+        self.__invalidate(key)
+        if name in self.__foreign_keys.get(obj.__class__.__name__, ()):
+            self.__partitions()
+            self.__unreference(key)
+            if obj.__class__.__name__ in FileStorage.__references:
+                self.__reference(key, obj)
+        if name in self.__numeric.get(obj.__class__.__name__, ()):
+            self.__partitions()
+            self.__unrank(key)
+            if obj.__class__.__name__ in FileStorage.__sorted:
+                self.__rank(key, obj)
+        if name in searchable.get(obj.__class__.__name__, ()) and \
+           FileStorage.__text is not None:
+            FileStorage.__text.add(key, document(obj, obj.__class__.__name__))
+        if name == "amenity_ids" and isinstance(obj, Place):
+            self.__partitions()
+            self.__link(key, obj)
+        if name in ("latitude", "longitude") and isinstance(obj, Place):
+            self.__partitions()
+            if FileStorage.__grid is not None:
+                self.__locate(key, obj)
+        if name == "created_at" and key in FileStorage.__created:
+            self.__unorder(key)
+            self.__order(key, obj)
+
+    def cached(self, obj):
+        """returns the cached to_dict() result of obj, or None if changed"""
+        key = obj.__class__.__name__ + "." + obj.__dict__.get("id", "")
+        entry = FileStorage.__serialized.get(key)
+        if entry is not None and entry[0] is obj:
+            FileStorage.__serialized.move_to_end(key)
+            return entry[1]
+        return None
+
+    def cache(self, obj, obj_dict):
+        """
+        keeps the to_dict() result of a stored obj until it changes, for
+        the __serialized_limit objects whose result was used last
+        """
+        key = obj.__class__.__name__ + "." + obj.__dict__.get("id", "")
+        if self.__objects.get(key) is obj:
+            FileStorage.__serialized[key] = (obj, obj_dict)
+            FileStorage.__serialized.move_to_end(key)
+            while len(FileStorage.__serialized) > self.__serialized_limit:
+                FileStorage.__serialized.popitem(last=False)
+
+    def related(self, cls, name, value):
+        """
+        This method retrieves the objects of a class by attribute value
+        cls: class
+        name: attribute name, usually a foreign key like state_id
+        value: value the attribute must be equal to
+        Returns the list of matching objects, in insertion order
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if name in self.__foreign_keys.get(cls, ()):
+            keys = self.__references_of(cls)[name].get(value, {})
+            return [self.__fetch(key) for key in list(keys)]
+        return [obj for obj in self.all(cls).values()
+                if getattr(obj, name, None) == value]
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0):
+        """
+        This method retrieves the objects of a class matching conditions
+        cls: class
+        where: dictionary of attribute: value, or attribute: (operator, value)
+               with operator one of ==, !=, <, <=, >, >=, in, between
+        order_by: attribute name or list of names, prefixed by - to reverse
+        limit: maximum number of objects returned (optional)
+        offset: number of matching objects skipped
+        Returns the list of matching objects
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        conds = conditions(where)
+        keys = self.__candidates(cls, conds)
+        if keys is None:
+            keys = list(self.__partitions().get(cls, {}))
+        objs = (self.__fetch(key) for key in keys)
+        objs = (obj for obj in objs if obj is not None and matches(obj, conds))
+        if order_by is not None:
+            objs = ordered(objs, order_by)
+        return window(objs, limit, offset)
+
+    def page(self, cls, where=None, limit=None, after=None):
+        """
+        This method retrieves a page of objects of a class by creation order
+        cls: class
+        where: conditions on the objects, as for query()
+        limit: maximum number of objects returned (optional)
+        after: (created_at, id) of the last object of the previous page,
+               with created_at formatted like to_dict() does
+        Returns the list of matching objects ordered by created_at then id
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        conds = conditions(where)
+        keys = self.__in_order(cls, self.__candidates(cls, conds), after)
+        objs = (self.__fetch(key) for key in keys)
+        objs = (obj for obj in objs if obj is not None and matches(obj, conds))
+        return window(objs, limit)
+
+    def __in_order(self, cls, keys=None, after=None):
+        """yields keys, or all keys of cls, by creation order after after"""
+        ordered = self.__order_of(cls)
+        if keys is not None and len(keys) * 4 < len(ordered):
+            ordered = sorted((FileStorage.__created[key],
+                              key.partition(".")[2]) for key in keys)
+            keys = None
+        elif keys is not None and not isinstance(keys, (set, dict)):
+            keys = set(keys)
+        start = bisect_right(ordered, tuple(after)) if after else 0
+        for i in range(start, len(ordered)):
+            key = cls + "." + ordered[i][1]
+            if keys is None or key in keys:
+                yield key
+
+    def __in_rank(self, cls, sort, keys, after=None):
+        """yields keys by the sorted index of a numeric attribute"""
+        name, descending = sort_keys(sort)[0]
+        if name not in self.__numeric.get(cls, ()):
+            raise ValueError("{} has no sorted index on {}".format(cls, name))
+        index = self.__sorted_of(cls)[name]
+        if len(keys) * 4 < len(index):
+            position = self.__numeric[cls].index(name)
+            index = sorted((FileStorage.__valued[key][position],
+                            key.partition(".")[2]) for key in keys
+                           if FileStorage.__valued[key][position] is not None)
+        elif not isinstance(keys, (set, dict)):
+            keys = set(keys)
+        if descending:
+            start = bisect_left(index, tuple(after)) if after else len(index)
+            positions = range(start - 1, -1, -1)
+        else:
+            start = bisect_right(index, tuple(after)) if after else 0
+            positions = range(start, len(index))
+        for i in positions:
+            key = cls + "." + index[i][1]
+            if key in keys:
+                yield key
+
+    def search_places(self, states=None, cities=None, amenities=None,
+                      limit=None, after=None, where=None, sort=None):
+        """
+        This method searches places by location and amenities
+        states: ids of states whose places are included
+        cities: ids of cities whose places are included
+                (all places if neither states nor cities match any place)
+        amenities: ids of amenities all the places must have
+        limit: maximum number of places returned (optional)
+        after: (created_at, id) of the last place of the previous page,
+               or (value, id) when sorted
+        where: conditions on the places, as for query()
+        sort: numeric attribute to sort by, prefixed by - to reverse
+        Returns the list of matching places ordered by sort, or by
+        created_at, then id
+        """
+        conds = conditions(where)
+        keys = self.__searched(states, cities, amenities, conds)
+        if sort is None:
+            keys = self.__in_order("Place", keys, after)
+        else:
+            keys = self.__in_rank("Place", sort, keys, after)
+        objs = (self.__fetch(key) for key in keys)
+        return window((obj for obj in objs if matches(obj, conds)), limit)
+
+    def facet_places(self, states=None, cities=None, amenities=None,
+                     where=None):
+        """
+        This method counts the places a search finds by facet
+        states, cities, amenities, where: the search, as for search_places()
+        Returns the number of places found by amenity, city and state id,
+        as {"amenities": {id: count}, "cities": {...}, "states": {...}}
+        """
+        conds = conditions(where)
+        keys = self.__searched(states, cities, amenities, conds)
+        if conds:
+            keys = {key for key in keys if matches(self.__fetch(key), conds)}
+        city_at = self.__foreign_keys["Place"].index("city_id")
+        cities, states = {}, {}
+        for key in keys:
+            city_id = FileStorage.__referenced[key][city_at]
+            if isinstance(city_id, str):
+                cities[city_id] = cities.get(city_id, 0) + 1
+        linked = FileStorage.__amenities
+        amenities = linked.counts(linked.rows_mask(keys))
+        for city_id, count in cities.items():
+            city = FileStorage.__referenced.get("City." + city_id)
+            if city is not None and isinstance(city[0], str):
+                states[city[0]] = states.get(city[0], 0) + count
+        return {"amenities": amenities, "cities": cities, "states": states}
+
+    def __searched(self, states, cities, amenities, conds):
+        """returns the set of keys of the places a search can match"""
+        city_ids = set(cities or ())
+        by_state = self.__references_of("City")["state_id"]
+        for state_id in states or ():
+            city_ids.update(key[5:] for key in by_state.get(state_id, {}))
+        by_city = self.__references_of("Place")["city_id"]
+        keys = set()
+        for city_id in city_ids:
+            keys.update(by_city.get(city_id, {}))
+        linked = FileStorage.__amenities
+        if keys and amenities:
+            keys = {key for key in keys if linked.has_all(key, amenities)}
+        elif amenities:
+            keys = set(linked.rows_of(linked.all_of(amenities)))
+        elif not keys:
+            keys = set(FileStorage.__by_class.get("Place", {}))
+        candidates = self.__candidates("Place", conds)
+        if candidates is not None:
+            keys.intersection_update(candidates)
+        return keys
+
+    def amenities_of(self, place):
+        """
+        This method retrieves the amenities of a place
+        place: Place instance
+        Returns the list of its Amenity instances, read from the amenity
+        bitmap once the place is stored
+        """
+        amenities = (self.__fetch("Amenity." + id)
+                     for id in self.amenity_ids_of(place))
+        return [amenity for amenity in amenities if amenity is not None]
+
+    def amenity_ids_of(self, place):
+        """
+        This method retrieves the amenity_ids of a place
+        place: Place instance
+        Returns the list of the ids of its amenities, read from the amenity
+        bitmap once the place is stored and setting amenity_ids when changed
+        in place, else the list of the place, an empty one if not set
+        """
+        self.__partitions()
+        key = "Place." + place.__dict__.get("id", "")
+        if self.__objects.get(key) is place or \
+           FileStorage.__views.get(key) is place:
+            return LinkedIds(FileStorage.__amenities.columns_of(key) or [],
+                             place)
+        return place.__dict__.setdefault("amenity_ids", [])
+
+    def places_within(self, south, west, north, east, limit=None):
+        """
+        This method retrieves the places inside a bounding box
+        south, north: latitudes bounding the box
+        west, east: longitudes bounding the box, west > east if the box
+                    crosses the antimeridian
+        limit: maximum number of places returned (optional)
+        Returns the list of places ordered by created_at then id
+        """
+        self.__partitions()
+        keys = {key for box in boxes(south, west, north, east)
+                for key, lat, lon in self.__grid_of().search(*box)}
+        keys = self.__in_order("Place", keys)
+        return [self.__fetch(key) for key in window(keys, limit)]
+
+    def nearest_places(self, latitude, longitude, k=10, radius=None):
+        """
+        This method retrieves the places nearest to a point
+        latitude, longitude: coordinates of the point
+        k: maximum number of places returned (optional)
+        radius: maximum distance in kilometers (optional)
+        Returns the list of (place, distance in kilometers) by distance
+        """
+        self.__partitions()
+        found = nearest(self.__grid_of().search, latitude, longitude,
+                        k, radius)
+        return [(self.__fetch(key), dist) for dist, key in found]
+
+    def search(self, text, cls=None, limit=10):
+        """
+        This method searches the places and reviews by their text
+        text: words searched, ranked by BM25
+        cls: class, Place or Review, searched (optional)
+        limit: maximum number of objects returned (optional)
+        Returns the list of (object, score) by decreasing score
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        found = self.__text_index().search(
+            text, limit, cls + "." if cls is not None else None)
+        return [(self.__fetch(key), score) for key, score in found]
+
+    def __text_index(self):
+        """returns the full-text index, loading or building it if needed"""
+        partitions = self.__partitions()
+        if FileStorage.__text is None:
+            path = self.__file_path + ".search"
+            index = TextIndex.load(path)
+            documents = ((key, document(obj if obj is not None
+                                        else FileStorage.__records[key],
+                                        name))
+                         for name in searchable
+                         for key, obj in partitions.get(name, {}).items())
+            if index.sync(documents):
+                index.save(path)
+            FileStorage.__text = index
+        return FileStorage.__text
+
+    def __candidates(self, cls, conds):
+        """returns the keys narrowed down by the indexed conditions, or None"""
+        partition = self.__partitions().get(cls, {})
+        candidates = None
+        for name, op, value in conds:
+            values = value if op == "in" else {value}
+            if op not in ("==", "in"):
+                keys = None
+            elif name == "id":
+                keys = [cls + "." + v for v in values if isinstance(v, str)]
+                keys = [key for key in keys if key in partition]
+            elif name in self.__foreign_keys.get(cls, ()):
+                index = self.__references_of(cls)[name]
+                keys = [key for v in values if v in index for key in index[v]]
+            else:
+                keys = None
+            if keys is None and name in self.__numeric.get(cls, ()):
+                keys = self.__range(cls, name, op, value)
+            if keys is None:
+                continue
+            if candidates is None or len(keys) < len(candidates):
+                candidates = keys
+        return candidates
 
     def all(self, cls=None):
         """returns the dictionary __objects"""
         if cls is not None:
-            new_dict = {}
-            for key, value in self.__objects.items():
-                if cls == value.__class__ or cls == value.__class__.__name__:
-                    new_dict[key] = value
-            return new_dict
+            if not isinstance(cls, str):
+                cls = cls.__name__
+            partition = self.__partitions().get(cls, {})
+            return {key: obj if obj is not None else self.__fetch(key)
+                    for key, obj in list(partition.items())}
+        for key in list(FileStorage.__records):
+            self.__keep(key, self.__fetch(key))
         return self.__objects
 
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
         if obj is not None:
             key = obj.__class__.__name__ + "." + obj.id
-            self.__objects[key] = obj
+            self.__add(key, obj)
+            FileStorage.__dirty.add(key)
+
+    def bulk_new(self, objs):
+        """sets in __objects every object of objs, as new() does"""
+        for obj in objs:
+            self.new(obj)
+            FileStorage.__bulked += 1
+
+    def bulk_save(self, chunk=None, amenities=False):
+        """
+        This method saves the objects added by bulk_new() with one write
+        of the JSON file, or one append to its journal, as save() does
+        chunk, amenities: accepted for the interface of DBStorage, the
+        file holds every object and the amenity_ids of the places
+        Returns the number of objects added by bulk_new() saved
+        """
+        count, FileStorage.__bulked = FileStorage.__bulked, 0
+        self.save()
+        return count
 
     def save(self):
         """serializes __objects to the JSON file (path: __file_path)"""
-        json_objects = {}
-        for key in self.__objects:
-            json_objects[key] = self.__objects[key].to_dict()
-        with open(self.__file_path, 'w') as f:
-            json.dump(json_objects, f)
+        if not self.__journal:
+            self.compact()
+            return
+        lines = []
+        for key in FileStorage.__dirty:
+            obj = self.__objects.get(key)
+            if obj is not None:
+                value = obj.to_dict()
+            elif key in FileStorage.__records:
+                value = FileStorage.__records[key]
+            elif key in FileStorage.__deleted:
+                value = None
+            else:
+                continue
+            lines.append(json.dumps({"key": key, "value": value}) + "\n")
+        FileStorage.__dirty = set()
+        FileStorage.__deleted = set()
+        if lines:
+            with self.__locked(), \
+                    open(self.__file_path + ".journal", 'a') as f:
+                start = f.tell()
+                f.write("".join(lines))
+                size = f.tell()
+                inode = os.fstat(f.fileno()).st_ino
+            if start == 0 or FileStorage.__journal_at == (inode, start):
+                FileStorage.__journal_at = (inode, size)
+            if size > self.__journal_limit:
+                self.compact()
+
+    def compact(self):
+        """
+        rewrites the JSON file with all objects and empties the journal,
+        once the records other processes appended to it are applied
+        """
+        with self.__locked():
+            self.__replay_journal(keep=FileStorage.__dirty)
+            self.__write()
+
+    @contextmanager
+    def __locked(self):
+        """
+        holds the exclusive lock of the JSON file, taken to append to its
+        journal and to compact it, so no record is appended while the
+        journal is being applied and removed
+        """
+        with open(self.__file_path + ".lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __write(self):
+        """writes all objects to the JSON file and removes the journal"""
+        parts = []
+        for key, obj in self.__objects.items():
+            fragment = FileStorage.__fragments.get(key)
+            if fragment is None or fragment[0] is not obj:
+                fragment = (obj, json.dumps(obj.to_dict()))
+                FileStorage.__fragments[key] = fragment
+            parts.append(json.dumps(key) + ": " + fragment[1])
+        for key, record in FileStorage.__records.items():
+            if self.__columnar:
+                parts.append(json.dumps(key) + ": " + json.dumps(record))
+                continue
+            fragment = FileStorage.__fragments.get(key)
+            if fragment is None or fragment[0] is not None:
+                fragment = (None, json.dumps(record))
+                FileStorage.__fragments[key] = fragment
+            parts.append(json.dumps(key) + ": " + fragment[1])
+        with open(self.__file_path + ".tmp", 'w') as f:
+            f.write("{" + ", ".join(parts) + "}")
+        os.replace(self.__file_path + ".tmp", self.__file_path)
+        FileStorage.__dirty = set()
+        FileStorage.__deleted = set()
+        try:
+            os.remove(self.__file_path + ".journal")
+        except FileNotFoundError:
+            pass
+        FileStorage.__snapshot = self.__stat(self.__file_path)
+        FileStorage.__journal_at = None
 
     def reload(self):
-        """deserializes the JSON file to __objects"""
+        """
+        deserializes the JSON file and replays its journal to __objects,
+        dropping the objects saved before that are no longer in the file
+        """
+        FileStorage.__snapshot = self.__stat(self.__file_path)
         try:
             with open(self.__file_path, 'r') as f:
                 jo = json.load(f)
+            gone = [key for keys in (self.__objects, FileStorage.__records)
+                    for key in keys
+                    if key not in jo and key not in FileStorage.__dirty]
+            for key in gone:
+                self.__remove(key)
             for key in jo:
-                self.__objects[key] = classes[jo[key]["__class__"]](**jo[key])
+                self.__load(key, jo[key])
         except FileNotFoundError as e:
             pass
+        FileStorage.__journal_at = None
+        self.__replay_journal()
+
+    def __stat(self, path):
+        """returns the inode, size and mtime of path, or None if missing"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def __replay_journal(self, keep=()):
+        """
+        applies the journal records appended since it was last read, but
+        those of the keys in keep
+        """
+        try:
+            f = open(self.__file_path + ".journal", 'rb')
+        except FileNotFoundError:
+            FileStorage.__journal_at = None
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            inode, offset = FileStorage.__journal_at or (st.st_ino, 0)
+            data = None
+            if inode == st.st_ino and offset <= st.st_size:
+                f.seek(offset)
+                data = f.read()
+        if data is None:
+            self.reload()
+            return
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record["key"] not in keep:
+                self.__replay(record["key"], record["value"])
+        FileStorage.__journal_at = (st.st_ino, offset + end)
+
+    def __replay(self, key, value):
+        """applies one journal record to __objects"""
+        if value is None:
+            self.__remove(key)
+        else:
+            self.__load(key, value)
 
     def delete(self, obj=None):
         """delete obj from __objects if it’s inside"""
         if obj is not None:
             key = obj.__class__.__name__ + '.' + obj.id
-            if key in self.__objects:
-                del self.__objects[key]
+            self.__remove(key)
+            FileStorage.__dirty.add(key)
+            FileStorage.__deleted.add(key)
 
-    def close(self):
-        """call reload() method for deserializing the JSON file to objects"""
+    def rollback(self):
+        """discards the changes made since save() by reloading their objects"""
+        for key in FileStorage.__dirty:
+            self.__remove(key)
+        FileStorage.__dirty = set()
+        FileStorage.__deleted = set()
         self.reload()
 
+    def close(self):
+        """reloads the JSON file and journal if they changed since read"""
+        if self.__stat(self.__file_path) != FileStorage.__snapshot:
+            self.reload()
+        else:
+            self.__replay_journal()
+
     def get(self, cls, id):
         """
         This ,ethod retrieves one object
@@ -79,7 +1103,7 @@ class FileStorage:
         """
         if cls is not None and id is not None:
             key = cls.__name__ + "." + id
-            return self.__objects.get(key, None)
+            return self.__fetch(key)
         return None
 
     def count(self, cls=None):
@@ -90,5 +1114,7 @@ class FileStorage:
         If no class is passed, returns the count of all objects in storage.
         """
         if cls is not None:
-            return len(self.all(cls))
-        return len(self.__objects)
+            if not isinstance(cls, str):
+                cls = cls.__name__
+            return len(self.__partitions().get(cls, {}))
+        return len(self.__objects) + len(FileStorage.__records)
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""
+Contains the GridIndex class and the helpers of the geospatial search
+"""
+
+from math import asin, cos, floor, pi, radians, sin, sqrt
+
+# float - mean radius of the Earth in kilometers
+EARTH_RADIUS = 6371.0088
+# float - length of one degree of latitude in kilometers
+KM_PER_DEGREE = EARTH_RADIUS * pi / 180
+# float - largest distance between two points of the Earth in kilometers
+HALF_CIRCUMFERENCE = EARTH_RADIUS * pi
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """returns the great-circle distance in kilometers between two points"""
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    h = sin((lat2 - lat1) / 2) ** 2 + \
+        cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(min(1.0, sqrt(h)))
+
+
+def boxes(south, west, north, east):
+    """returns a bounding box as boxes that do not cross the antimeridian"""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def around(lat, lon, radius):
+    """returns the boxes holding every point within radius km of a point"""
+    delta = radius / KM_PER_DEGREE
+    south, north = max(lat - delta, -90.0), min(lat + delta, 90.0)
+    if south <= -90.0 or north >= 90.0:
+        return [(south, -180.0, north, 180.0)]
+    delta /= cos(radians(max(abs(south), abs(north))))
+    if delta >= 180.0:
+        return [(south, -180.0, north, 180.0)]
+    west, east = lon - delta, lon + delta
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return boxes(south, west, north, east)
+
+
+def nearest(search, lat, lon, k=None, radius=None):
+    """
+    Finds the points nearest to a point by searching growing boxes
+    search: function returning the (key, lat, lon) of the points in a box
+    k: maximum number of points returned (optional)
+    radius: maximum distance in kilometers (optional)
+    Returns the list of (distance, key) sorted by distance
+    """
+    limit = HALF_CIRCUMFERENCE
+    if radius is not None and radius < limit:
+        # NaN never compares lower, so the boxes always stop growing
+        limit = radius
+    reach = min(10.0, limit)
+    while True:
+        found = {}
+        for box in around(lat, lon, reach):
+            for key, point_lat, point_lon in search(*box):
+                found[key] = distance(lat, lon, point_lat, point_lon)
+        within = sorted((dist, key) for key, dist in found.items()
+                        if dist <= reach)
+        if reach >= limit or (k is not None and len(within) >= k):
+            return within[:k]
+        reach = min(reach * 4, limit)
+
+
+class GridIndex:
+    """buckets points by the cell of a latitude/longitude grid they are in"""
+
+    def __init__(self, size=0.5):
+        """Instantiate an empty grid of cells of size degrees"""
+        self.size = size
+        self.cells = {}
+        self.points = {}
+
+    def add(self, key, lat, lon):
+        """adds or moves the point key, ignored if it has no coordinates"""
+        self.remove(key)
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return
+        cell = (floor(lat / self.size), floor(lon / self.size))
+        self.cells.setdefault(cell, {})[key] = (lat, lon)
+        self.points[key] = cell
+
+    def remove(self, key):
+        """removes the point key if it is in the grid"""
+        cell = self.points.pop(key, None)
+        if cell is not None:
+            del self.cells[cell][key]
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def search(self, south, west, north, east):
+        """returns the (key, lat, lon) of the points inside a box"""
+        rows = range(floor(south / self.size), floor(north / self.size) + 1)
+        cols = range(floor(west / self.size), floor(east / self.size) + 1)
+        if len(rows) * len(cols) > len(self.cells):
+            cells = [bucket for cell, bucket in self.cells.items()
+                     if cell[0] in rows and cell[1] in cols]
+        else:
+            cells = [self.cells[(row, col)] for row in rows for col in cols
+                     if (row, col) in self.cells]
+        return [(key, lat, lon) for bucket in cells
+                for key, (lat, lon) in bucket.items()
+                if south <= lat <= north and west <= lon <= east]
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+Contains the helpers shared by the query() method of the storage engines
+"""
+
+from itertools import islice
+
+# dictionary - operators accepted in a where clause and how they match
+operators = {"==": lambda a, b: a == b,
+             "!=": lambda a, b: a != b,
+             "<": lambda a, b: a < b,
+             "<=": lambda a, b: a <= b,
+             ">": lambda a, b: a > b,
+             ">=": lambda a, b: a >= b,
+             "in": lambda a, b: a in b,
+             "between": lambda a, b: b[0] <= a <= b[1]}
+
+
+def conditions(where):
+    """
+    Returns the list of (attribute, operator, value) of a where clause
+    where: dictionary of attribute: value for an equality, or
+           attribute: (operator, value) for any key of operators
+    """
+    conds = []
+    for name, cond in (where or {}).items():
+        if isinstance(cond, tuple) and len(cond) == 2 and \
+           isinstance(cond[0], str) and cond[0] in operators:
+            op, value = cond
+        else:
+            op, value = "==", cond
+        if op == "in":
+            value = set(value)
+        elif op == "between" and len(value) != 2:
+            raise ValueError("between needs a (low, high) pair")
+        conds.append((name, op, value))
+    return conds
+
+
+def sort_keys(order_by):
+    """
+    Returns the list of (attribute, descending) of an order_by argument
+    order_by: attribute name or list of names, prefixed by - to reverse
+    """
+    if order_by is None:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    return [(name[1:], True) if name.startswith("-") else (name, False)
+            for name in order_by]
+
+
+def matches(obj, conds):
+    """returns True if obj satisfies every condition of conds"""
+    for name, op, value in conds:
+        attr = getattr(obj, name, None)
+        if attr is None and op not in ("==", "!=", "in"):
+            return False
+        try:
+            if not operators[op](attr, value):
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def ordered(objs, order_by):
+    """returns objs sorted by the attributes of order_by, None first"""
+    objs = list(objs)
+    for name, descending in reversed(sort_keys(order_by)):
+        objs.sort(key=lambda obj: (getattr(obj, name, None) is not None,
+                                   getattr(obj, name, None)),
+                  reverse=descending)
+    return objs
+
+
+def window(objs, limit=None, offset=0):
+    """returns the list of at most limit objects of objs after offset"""
+    offset = offset or 0
+    stop = offset + limit if limit is not None else None
+    return list(islice(objs, offset, stop))
@@ -0,0 +1,20 @@
+#!/usr/bin/python3
+"""
+Contains the class SQLiteStorage
+"""
+
+from models.engine.db_storage import DBStorage
+from os import getenv
+
+
+class SQLiteStorage(DBStorage):
+    """interacts with a local SQLite database file"""
+
+    def __init__(self):
+        """
+        Instantiate a SQLiteStorage object on the HBNB_SQLITE_DB file,
+        with its full-text index next to it
+        """
+        HBNB_SQLITE_DB = getenv('HBNB_SQLITE_DB', 'hbnb.db')
+        super().__init__('sqlite:///{}'.format(HBNB_SQLITE_DB),
+                         HBNB_SQLITE_DB + '.search')
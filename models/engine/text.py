@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+"""
+Contains the TextIndex class and the helpers of the full-text search
+"""
+
+from heapq import nlargest
+import json
+from math import log
+import os
+import re
+from zlib import crc32
+
+# dictionary - attributes whose text is searchable for each class name
+searchable = {"Place": ("name", "description"), "Review": ("text",)}
+# set - words too common to tell documents apart, never indexed
+stopwords = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "for",
+             "from", "has", "have", "i", "in", "is", "it", "its", "of", "on",
+             "or", "so", "that", "the", "this", "to", "was", "we", "were",
+             "with", "you"}
+# compiled regex - runs of letters and digits
+word = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """returns the list of indexed terms of a text, in order"""
+    return [term for term in word.findall(text.lower())
+            if term not in stopwords]
+
+
+def document(source, name):
+    """returns the searchable text of an object or raw record of class name"""
+    if isinstance(source, dict):
+        values = [source.get(attr) for attr in searchable[name]]
+    else:
+        values = [getattr(source, attr, None) for attr in searchable[name]]
+    return " ".join(str(value) for value in values if value)
+
+
+class TextIndex:
+    """inverted index of documents ranked by BM25"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        """Instantiate an empty index with the BM25 parameters k1 and b"""
+        self.k1 = k1
+        self.b = b
+        self.ids = {}
+        self.keys = []
+        self.sums = []
+        self.lengths = []
+        self.postings = {}
+        self.total = 0
+        self.longest = 0
+
+    def __len__(self):
+        """returns the number of documents indexed"""
+        return len(self.ids)
+
+    def add(self, key, text):
+        """
+        Indexes the text of the document key, replacing its previous text
+        Returns True if the index changed
+        """
+        checksum = crc32(text.encode())
+        doc = self.ids.get(key)
+        if doc is not None and self.sums[doc] == checksum:
+            return False
+        self.remove(key)
+        terms = tokenize(text)
+        doc = len(self.keys)
+        self.ids[key] = doc
+        self.keys.append(key)
+        self.sums.append(checksum)
+        self.lengths.append(len(terms))
+        self.total += len(terms)
+        self.longest = max(self.longest, len(terms))
+        for term in terms:
+            postings = self.postings.setdefault(term, {})
+            postings[doc] = postings.get(doc, 0) + 1
+        return True
+
+    def remove(self, key):
+        """
+        Removes the document key; its postings are dropped by compact()
+        Returns True if the index changed
+        """
+        doc = self.ids.pop(key, None)
+        if doc is None:
+            return False
+        self.keys[doc] = None
+        self.total -= self.lengths[doc]
+        if len(self.keys) > 2 * len(self.ids) + 1024:
+            self.compact()
+        return True
+
+    def compact(self):
+        """renumbers the documents left, dropping the removed ones"""
+        numbers = {}
+        for doc, key in enumerate(self.keys):
+            if key is not None:
+                numbers[doc] = len(numbers)
+        self.keys = [self.keys[doc] for doc in numbers]
+        self.sums = [self.sums[doc] for doc in numbers]
+        self.lengths = [self.lengths[doc] for doc in numbers]
+        self.ids = {key: doc for doc, key in enumerate(self.keys)}
+        postings = {}
+        for term, docs in self.postings.items():
+            docs = {numbers[doc]: tf for doc, tf in docs.items()
+                    if doc in numbers}
+            if docs:
+                postings[term] = docs
+        self.postings = postings
+
+    def sync(self, documents):
+        """
+        Brings the index up to date with the (key, text) of every document,
+        retokenizing only the documents whose text changed
+        Returns the number of documents added, changed or removed
+        """
+        seen = set()
+        changed = 0
+        for key, text in documents:
+            seen.add(key)
+            changed += self.add(key, text)
+        for key in [key for key in self.ids if key not in seen]:
+            changed += self.remove(key)
+        return changed
+
+    def search(self, text, limit=10, prefix=None):
+        """
+        Ranks the documents matching the terms of text by BM25
+        limit: maximum number of documents returned (optional)
+        prefix: only returns the keys starting with prefix, like "Place."
+        Returns the list of (key, score) by decreasing score
+        """
+        count = len(self.ids)
+        if not count:
+            return []
+        average = self.total / count or 1
+        k1, b = self.k1, self.b
+        norms = [k1 * (1 - b + b * length / average)
+                 for length in range(self.longest + 1)]
+        lengths = self.lengths
+        scores = {}
+        postings = [self.postings.get(term, {})
+                    for term in set(tokenize(text))]
+        for docs in sorted(postings, key=len, reverse=True):
+            idf = log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            weight = idf * (k1 + 1)
+            if not scores:
+                scores = {doc: weight * tf / (tf + norms[lengths[doc]])
+                          for doc, tf in docs.items()}
+                continue
+            get = scores.get
+            for doc, tf in docs.items():
+                scores[doc] = get(doc, 0) + \
+                    weight * tf / (tf + norms[lengths[doc]])
+        keys = self.keys
+        if len(keys) > count:
+            scores = {doc: score for doc, score in scores.items()
+                      if keys[doc] is not None}
+        if prefix is not None:
+            scores = {doc: score for doc, score in scores.items()
+                      if keys[doc].startswith(prefix)}
+        if limit is None:
+            limit = len(scores)
+        best = nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(keys[doc], score) for doc, score in best]
+
+    def save(self, path):
+        """writes the index to path, replaced atomically"""
+        self.compact()
+        index = {"k1": self.k1, "b": self.b, "keys": self.keys,
+                 "sums": self.sums, "lengths": self.lengths,
+                 "postings": {term: [n for item in docs.items() for n in item]
+                              for term, docs in self.postings.items()}}
+        with open(path + ".tmp", 'w') as f:
+            json.dump(index, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """returns the index saved in path, or an empty one if unreadable"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            index = cls(data["k1"], data["b"])
+            index.keys = data["keys"]
+            index.sums = data["sums"]
+            index.lengths = data["lengths"]
+            index.postings = {term: dict(zip(docs[::2], docs[1::2]))
+                              for term, docs in data["postings"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls()
+        index.ids = {key: doc for doc, key in enumerate(index.keys)}
+        index.total = sum(index.lengths)
+        index.longest = max(index.lengths, default=0)
+        return index
@@ -3,34 +3,44 @@
 import models
 from models.base_model import BaseModel, Base
 from os import getenv
-import sqlalchemy
-from sqlalchemy import Column, String, Integer, Float, ForeignKey, Table
-from sqlalchemy.orm import relationship
+
+if models.storage_t == 'db':
+    from models.base_model import id_column
+    from sqlalchemy import Column, String, Integer, Float, ForeignKey, Table
+    from sqlalchemy import Index
+    from sqlalchemy.orm import relationship
 
 if models.storage_t == 'db':
     place_amenity = Table('place_amenity', Base.metadata,
-                          Column('place_id', String(60),
+                          Column('place_id', id_column(),
                                  ForeignKey('places.id', onupdate='CASCADE',
                                             ondelete='CASCADE'),
                                  primary_key=True),
-                          Column('amenity_id', String(60),
+                          Column('amenity_id', id_column(),
                                  ForeignKey('amenities.id', onupdate='CASCADE',
                                             ondelete='CASCADE'),
-                                 primary_key=True))
+                                 primary_key=True, index=True))
 
 
 class Place(BaseModel, Base):
     """Representation of Place """
     if models.storage_t == 'db':
         __tablename__ = 'places'
-        city_id = Column(String(60), ForeignKey('cities.id'), nullable=False)
-        user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
+        __table_args__ = (Index('ix_places_location', 'latitude',
+                                'longitude'),)
+        city_id = Column(id_column(), ForeignKey('cities.id'),
+                         nullable=False, index=True)
+        user_id = Column(id_column(), ForeignKey('users.id'),
+                         nullable=False, index=True)
         name = Column(String(128), nullable=False)
         description = Column(String(1024), nullable=True)
-        number_rooms = Column(Integer, nullable=False, default=0)
-        number_bathrooms = Column(Integer, nullable=False, default=0)
-        max_guest = Column(Integer, nullable=False, default=0)
-        price_by_night = Column(Integer, nullable=False, default=0)
+        number_rooms = Column(Integer, nullable=False, default=0,
+                              index=True)
+        number_bathrooms = Column(Integer, nullable=False, default=0,
+                                  index=True)
+        max_guest = Column(Integer, nullable=False, default=0, index=True)
+        price_by_night = Column(Integer, nullable=False, default=0,
+                                index=True)
         latitude = Column(Float, nullable=True)
         longitude = Column(Float, nullable=True)
         reviews = relationship("Review", backref="place")
@@ -48,31 +58,62 @@ class Place(BaseModel, Base):
         price_by_night = 0
         latitude = 0.0
         longitude = 0.0
-        amenity_ids = []
 
     def __init__(self, *args, **kwargs):
         """initializes Place"""
         super().__init__(*args, **kwargs)
 
     if models.storage_t != 'db':
+        @property
+        def amenity_ids(self):
+            """getter attribute returns the list of ids of the amenities"""
+            return models.storage.amenity_ids_of(self)
+
+        @amenity_ids.setter
+        def amenity_ids(self, ids):
+            """setter attribute sets the list of ids of the amenities"""
+            self.__dict__["amenity_ids"] = ids
+
+        @amenity_ids.deleter
+        def amenity_ids(self):
+            """deleter attribute removes the list of ids of the amenities"""
+            try:
+                del self.__dict__["amenity_ids"]
+            except KeyError:
+                raise AttributeError("amenity_ids") from None
+
+        def __str__(self):
+            """String representation of the Place, with its amenity_ids"""
+            attrs = self.__dict__
+            if "amenity_ids" in attrs:
+                attrs = dict(attrs, amenity_ids=list(self.amenity_ids))
+            return "[{:s}] ({:s}) {}".format(self.__class__.__name__,
+                                             self.id, attrs)
+
+        def to_dict(self):
+            """
+            returns a dictionary containing all keys/values of the instance,
+            amenity_ids read from the amenity bitmap once the place is stored
+            """
+            new_dict = super().to_dict()
+            if "amenity_ids" in new_dict:
+                new_dict["amenity_ids"] = list(self.amenity_ids)
+            return new_dict
+
         @property
         def reviews(self):
             """getter attribute returns the list of Review instances"""
             from models.review import Review
-            review_list = []
-            all_reviews = models.storage.all(Review)
-            for review in all_reviews.values():
-                if review.place_id == self.id:
-                    review_list.append(review)
-            return review_list
+            return models.storage.related(Review, "place_id", self.id)
 
         @property
         def amenities(self):
             """getter attribute returns the list of Amenity instances"""
+            return models.storage.amenities_of(self)
+
+        @amenities.setter
+        def amenities(self, obj):
+            """setter attribute adds the id of an Amenity to amenity_ids"""
             from models.amenity import Amenity
-            amenity_list = []
-            all_amenities = models.storage.all(Amenity)
-            for amenity in all_amenities.values():
-                if amenity.place_id == self.id:
-                    amenity_list.append(amenity)
-            return amenity_list
+            if isinstance(obj, Amenity) and obj.id not in self.amenity_ids:
+                self.amenity_ids = self.amenity_ids + [obj.id]
@@ -3,16 +3,20 @@
 import models
 from models.base_model import BaseModel, Base
 from os import getenv
-import sqlalchemy
-from sqlalchemy import Column, String, ForeignKey
+
+if models.storage_t == 'db':
+    from models.base_model import id_column
+    from sqlalchemy import Column, String, ForeignKey
 
 
 class Review(BaseModel, Base):
     """Representation of Review """
     if models.storage_t == 'db':
         __tablename__ = 'reviews'
-        place_id = Column(String(60), ForeignKey('places.id'), nullable=False)
-        user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
+        place_id = Column(id_column(), ForeignKey('places.id'),
+                          nullable=False, index=True)
+        user_id = Column(id_column(), ForeignKey('users.id'),
+                         nullable=False, index=True)
         text = Column(String(1024), nullable=False)
     else:
         place_id = ""
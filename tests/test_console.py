@@ -5,8 +5,19 @@ Contains the class TestConsoleDocs
 
 import console
 import inspect
+from io import StringIO
+import json
+import models
+import os
+from models.city import City
+from models.place import Place
+from models.state import State
+from models.user import User
 import pep8
+import tempfile
 import unittest
+from unittest import mock
+import uuid
 HBNBCommand = console.HBNBCommand
 
 
@@ -39,3 +50,283 @@ class TestConsoleDocs(unittest.TestCase):
                          "HBNBCommand class needs a docstring")
         self.assertTrue(len(HBNBCommand.__doc__) >= 1,
                         "HBNBCommand class needs a docstring")
+
+
+class TestConsoleTransaction(unittest.TestCase):
+    """Class for testing the begin, commit and rollback commands"""
+    def run_command(self, console, line):
+        """returns what the console prints running line"""
+        with mock.patch("sys.stdout", new=StringIO()) as out:
+            console.onecmd(line)
+        return out.getvalue()
+
+    def test_commit(self):
+        """Test that commit saves the changes made since begin at once"""
+        cmd = HBNBCommand()
+        self.assertEqual(self.run_command(cmd, "commit"),
+                         "** no transaction open **\n")
+        with mock.patch.object(models.storage, "save",
+                               wraps=models.storage.save) as save:
+            self.run_command(cmd, "begin")
+            self.assertEqual(self.run_command(cmd, "begin"),
+                             "** transaction already open **\n")
+            id = self.run_command(cmd, 'create State name="Batch"').strip()
+            self.run_command(cmd, 'update State {} name "Batched"'.format(id))
+            save.assert_not_called()
+            self.run_command(cmd, "commit")
+            save.assert_called_once()
+        self.assertEqual(models.storage.get(State, id).name, "Batched")
+        self.run_command(cmd, "destroy State " + id)
+        self.assertIsNone(models.storage.get(State, id))
+
+    def test_rollback(self):
+        """Test that rollback discards the changes made since begin"""
+        cmd = HBNBCommand()
+        id = self.run_command(cmd, 'create State name="Kept"').strip()
+        self.run_command(cmd, "begin")
+        new_id = self.run_command(cmd, 'create State name="Lost"').strip()
+        self.run_command(cmd, "destroy State " + id)
+        self.run_command(cmd, "rollback")
+        self.assertIsNone(models.storage.get(State, new_id))
+        self.assertEqual(models.storage.get(State, id).name, "Kept")
+        self.run_command(cmd, "destroy State " + id)
+
+    def test_batch_commits_at_end(self):
+        """Test that a batch commits the transaction still open at EOF"""
+        cmd = HBNBCommand(stdin=StringIO('create State name="End"\n'))
+        cmd.use_rawinput = False
+        cmd.batch = cmd.transaction = True
+        with mock.patch("sys.stdout", new=StringIO()) as out:
+            cmd.cmdloop()
+        self.assertFalse(cmd.transaction)
+        id = out.getvalue().split()[-1]
+        self.assertEqual(models.storage.get(State, id).name, "End")
+        self.run_command(cmd, "destroy State " + id)
+
+
+class TestConsoleImport(unittest.TestCase):
+    """Class for testing the import command"""
+    def setUp(self):
+        """creates the directory of the files imported"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.ids = []
+
+    def tearDown(self):
+        """deletes the imported states and the files"""
+        for id in self.ids:
+            state = models.storage.get(State, id)
+            if state is not None:
+                models.storage.delete(state)
+        models.storage.save()
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        """writes text to the file name, returns its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def run_command(self, line):
+        """returns the lines the console prints running line"""
+        with mock.patch("sys.stdout", new=StringIO()) as out:
+            HBNBCommand().onecmd(line)
+        return out.getvalue().splitlines()
+
+    def test_import_ndjson(self):
+        """Test that valid NDJSON records are created, the others reported"""
+        self.ids = [str(uuid.uuid4()) for i in range(3)]
+        lines = [json.dumps({"id": self.ids[0], "name": "Ohio"}),
+                 "not json",
+                 json.dumps({"__class__": "City", "name": "Akron"}),
+                 "",
+                 json.dumps({"__class__": "State", "id": self.ids[1],
+                             "name": "Iowa"}),
+                 json.dumps({"id": self.ids[2], "name": "Utah"})]
+        path = self.write("states.ndjson", "\n".join(lines) + "\n")
+        with mock.patch.object(models.storage, "bulk_save",
+                               wraps=models.storage.bulk_save) as save:
+            out = self.run_command("import State {} 2".format(path))
+            self.assertEqual(save.call_count, 2)
+        self.assertEqual(out[:2], ["** line 2: not a JSON object **",
+                                   "** line 3: record of another class **"])
+        self.assertTrue(out[2].startswith("3 imported, 2 rejected in "))
+        self.assertTrue(out[2].endswith(" rows/s)"))
+        names = [models.storage.get(State, id).name for id in self.ids]
+        self.assertEqual(names, ["Ohio", "Iowa", "Utah"])
+
+    def test_import_csv(self):
+        """Test that CSV rows are created with the class of their column"""
+        self.ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        path = self.write("states.csv", "__class__,id,name\n" +
+                          "State,{},Idaho\nState,{},Maine\n".format(
+                              *self.ids))
+        out = self.run_command("import auto " + path)
+        self.assertTrue(out[0].startswith("2 imported, 0 rejected"))
+        self.assertEqual(models.storage.get(State, self.ids[1]).name, "Maine")
+
+    def test_import_duplicate_ids(self):
+        """Test that records whose id exists are rejected one by one"""
+        self.ids = [str(uuid.uuid4()) for i in range(3)]
+        path = self.write("first.ndjson", json.dumps(
+            {"id": self.ids[0], "name": "Ohio"}) + "\n")
+        self.run_command("import State " + path)
+        lines = [json.dumps({"id": self.ids[0], "name": "Texas"}),
+                 json.dumps({"id": self.ids[1], "name": "Iowa"}),
+                 json.dumps({"id": self.ids[1], "name": "Utah"}),
+                 json.dumps({"id": self.ids[2], "name": "Idaho"})]
+        path = self.write("states.ndjson", "\n".join(lines) + "\n")
+        with mock.patch.object(models.storage, "query",
+                               wraps=models.storage.query) as query:
+            out = self.run_command("import State " + path)
+            self.assertEqual(query.call_count, 1)
+        self.assertEqual(out[:2], [
+            "** line 3: id {} already exists **".format(self.ids[1]),
+            "** line 1: id {} already exists **".format(self.ids[0])])
+        self.assertTrue(out[2].startswith("2 imported, 2 rejected in "))
+        names = [models.storage.get(State, id).name for id in self.ids]
+        self.assertEqual(names, ["Ohio", "Iowa", "Idaho"])
+
+    def test_import_optional_fields(self):
+        """Test that a chunk of records setting different optional fields
+        is imported at once"""
+        user = User(email="import@hbnb.io", password="pwd")
+        city = City(name="Akron", state_id=str(uuid.uuid4()))
+        state = State(id=city.state_id, name="Ohio")
+        for obj in [state, city, user]:
+            models.storage.new(obj)
+        models.storage.save()
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        lines = [json.dumps({"id": ids[0], "name": "Loft", "city_id": city.id,
+                             "user_id": user.id, "description": "Sunny",
+                             "number_rooms": 2}),
+                 json.dumps({"id": ids[1], "name": "Shed", "city_id": city.id,
+                             "user_id": user.id})]
+        path = self.write("places.ndjson", "\n".join(lines) + "\n")
+        out = self.run_command("import Place " + path)
+        self.assertTrue(out[0].startswith("2 imported, 0 rejected in "))
+        places = [models.storage.get(Place, id) for id in ids]
+        self.assertEqual(places[0].description, "Sunny")
+        self.assertEqual(places[0].number_rooms, 2)
+        self.assertEqual(places[1].name, "Shed")
+        self.assertEqual(places[1].number_rooms, 0)
+        for obj in places + [city, user, state]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    def test_import_chunk_failed(self):
+        """Test that the records of a chunk storage fails to save are
+        counted as rejected"""
+        self.ids = [str(uuid.uuid4()) for i in range(3)]
+        lines = [json.dumps({"id": id, "name": "Ohio"}) for id in self.ids]
+        path = self.write("states.ndjson", "\n".join(lines) + "\n")
+        with mock.patch.object(models.storage, "bulk_save",
+                               side_effect=ValueError("refused")):
+            out = self.run_command("import State {} 2".format(path))
+        self.assertEqual(out[:2], [
+            "** chunk ending at line 2 not saved: refused **",
+            "** chunk ending at line 3 not saved: refused **"])
+        self.assertTrue(out[2].startswith("0 imported, 3 rejected in "))
+        for id in self.ids:
+            self.assertIsNone(models.storage.get(State, id))
+
+    def test_import_errors(self):
+        """Test the messages of an import given wrong arguments"""
+        self.assertEqual(self.run_command("import"),
+                         ["** class name missing **"])
+        self.assertEqual(self.run_command("import Nope x"),
+                         ["** class doesn't exist **"])
+        self.assertEqual(self.run_command("import State"),
+                         ["** file path missing **"])
+        self.assertEqual(self.run_command("import State x 0"),
+                         ["** invalid chunk size **"])
+        missing = os.path.join(self.directory.name, "missing.ndjson")
+        self.assertEqual(self.run_command("import State " + missing),
+                         ["** cannot read file: No such file or directory **"])
+
+
+class TestConsoleAllExport(unittest.TestCase):
+    """Class for testing the options of all and the export command"""
+    @classmethod
+    def setUpClass(cls):
+        """creates three states named alike"""
+        cls.states = [State(name="Vermont") for i in range(3)]
+        for state in cls.states:
+            models.storage.new(state)
+        models.storage.save()
+        cls.states.sort(key=lambda state: (state.created_at, state.id))
+
+    @classmethod
+    def tearDownClass(cls):
+        """deletes the states"""
+        for state in cls.states:
+            models.storage.delete(state)
+        models.storage.save()
+
+    def run_command(self, line):
+        """returns what the console prints running line"""
+        with mock.patch("sys.stdout", new=StringIO()) as out:
+            HBNBCommand().onecmd(line)
+        return out.getvalue()
+
+    def test_all_where_fields(self):
+        """Test that all prints the selected fields of matching objects"""
+        out = self.run_command("all State --where name=Vermont --fields name")
+        expected = ", ".join("[State] ({}) {{'name': 'Vermont'}}".format(
+            state.id) for state in self.states)
+        self.assertEqual(out, "[" + expected + "]\n")
+
+    def test_all_limit(self):
+        """Test that all stops after limit objects"""
+        with mock.patch.object(console, "page_size", 2):
+            out = self.run_command("all State --where name=Vermont --limit 3")
+        self.assertEqual(out.count("[State]"), 3)
+        for state in self.states:
+            self.assertIn(state.id, out)
+        out = self.run_command("all --where name=Vermont --limit 1")
+        self.assertEqual(out.count("[State]"), 1)
+
+    def test_all_errors(self):
+        """Test the messages of all given invalid options"""
+        self.assertEqual(self.run_command("all State --limit"),
+                         "** invalid option --limit **\n")
+        self.assertEqual(self.run_command("all State --limit -1"),
+                         "** invalid limit **\n")
+        self.assertEqual(self.run_command("all State --where name"),
+                         "** invalid condition name **\n")
+        self.assertEqual(self.run_command("all State --order name"),
+                         "** invalid option --order **\n")
+
+    @unittest.skipIf(models.storage_t != 'db', "db mode only")
+    def test_all_unmapped(self):
+        """Test that all lists no instances of a class without a table"""
+        self.assertEqual(self.run_command("all BaseModel"), "[]\n")
+        self.assertEqual(self.run_command("all BaseModel --where name=x"),
+                         "[]\n")
+        self.assertEqual(self.run_command("all State --where nope=x"),
+                         "** attribute doesn't exist **\n")
+
+    def test_export(self):
+        """Test that export writes one to_dict() per line"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "states.ndjson")
+            with mock.patch.object(console, "page_size", 2):
+                out = self.run_command(
+                    "export State {} --where name=Vermont".format(path))
+            self.assertEqual(out, "3 exported\n")
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual(records, [state.to_dict() for state in self.states])
+        out = self.run_command("export State --where name=Vermont --limit 1 "
+                               "--fields id,__class__")
+        self.assertEqual(json.loads(out), {"id": self.states[0].id,
+                                           "__class__": "State"})
+
+    def test_export_wrong_class(self):
+        """Test that export given a path after a wrong class writes nothing"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "states.ndjson")
+            out = self.run_command("export Stat " + path)
+            self.assertEqual(out, "** class doesn't exist **\n")
+            self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists("Stat"))
@@ -3,7 +3,10 @@
 from datetime import datetime
 import inspect
 import models
+import os
 import pep8 as pycodestyle
+import subprocess
+import sys
 import time
 import unittest
 from unittest import mock
@@ -110,6 +113,74 @@ class TestBaseModel(unittest.TestCase):
                                  '-[0-9a-f]{12}$')
         self.assertNotEqual(inst1.id, inst2.id)
 
+    @unittest.skipIf(models.storage_t == 'db', "file mode only")
+    def test_no_sqlalchemy(self):
+        """Test that file mode imports the models without SQLAlchemy"""
+        code = "import sys, console; print('sqlalchemy' in sys.modules)"
+        env = dict(os.environ)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        out = subprocess.run([sys.executable, "-c", code], env=env,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+    @unittest.skipIf(models.storage_t != 'db', "db mode only")
+    def test_models_mapped(self):
+        """Test that db mode builds any model imported on its own"""
+        env = dict(os.environ)
+        env.pop("HBNB_ENV", None)
+        for name in ["amenity", "city", "place", "review", "state", "user"]:
+            code = "from models.{0} import {1}; {1}()".format(
+                name, name.capitalize())
+            with self.subTest(name=name):
+                subprocess.run([sys.executable, "-c", code], env=env,
+                               capture_output=True, check=True)
+
+    def test_uuid7(self):
+        """Test that uuid7 ids sort by creation and carry their datetime"""
+        ids = [str(models.base_model.uuid7()) for i in range(1000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(id[14] == "7" for id in ids))
+        when = datetime(2030, 1, 2, 3, 4, 5, 678901)
+        with mock.patch.object(models.base_model, "last_micros", 0):
+            id = str(models.base_model.uuid7(when))
+        self.assertEqual(models.base_model.id_time(id), when)
+        self.assertGreater(id, ids[-1])
+        self.assertIsNone(models.base_model.id_time(
+            "2f6a4a30-9d0e-4e2d-8a4c-2f0a9b1d7e31"))
+        self.assertIsNone(models.base_model.id_time("missing"))
+
+    def test_new_id_uuid7(self):
+        """Test that new instances get uuid7 ids when configured"""
+        with mock.patch.object(models.base_model, "id_type", "uuid7"):
+            inst1 = BaseModel()
+            inst2 = BaseModel()
+        self.assertEqual(inst1.id[14], "7")
+        self.assertLess(inst1.id, inst2.id)
+        self.assertEqual(models.base_model.id_time(inst1.id),
+                         inst1.created_at)
+        self.assertEqual(BaseModel(**inst1.to_dict()).id, inst1.id)
+        with mock.patch.object(models.base_model, "id_type", "uuid7"):
+            inst3 = BaseModel(name="kwargs")
+        self.assertEqual(models.base_model.id_time(inst3.id),
+                         inst3.created_at)
+        self.assertEqual(inst3.updated_at, inst3.created_at)
+        self.assertLessEqual(inst2.created_at, inst3.created_at)
+
+    @unittest.skipIf(models.storage_t != 'db', "SQLAlchemy only in db mode")
+    def test_binary_id(self):
+        """Test that BinaryId stores UUIDs as 16 bytes"""
+        binary = models.base_model.BinaryId()
+        for id in [str(models.base_model.uuid7()),
+                   "2f6a4a30-9d0e-4e2d-8a4c-2f0a9b1d7e31"]:
+            with self.subTest(id=id):
+                data = binary.process_bind_param(id, None)
+                self.assertEqual(len(data), 16)
+                self.assertEqual(binary.process_result_value(data, None), id)
+        self.assertEqual(binary.process_bind_param("missing", None),
+                         b"missing")
+        self.assertIsNone(binary.process_bind_param(None, None))
+
     def test_to_dict(self):
         """Test conversion of object attributes to dictionary for json"""
         my_model = BaseModel()
@@ -138,6 +209,33 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(new_d["created_at"], bm.created_at.strftime(t_format))
         self.assertEqual(new_d["updated_at"], bm.updated_at.strftime(t_format))
 
+    def test_format_parse_time(self):
+        """test that format_time and parse_time agree with the time format"""
+        t_format = "%Y-%m-%dT%H:%M:%S.%f"
+        for value in [datetime(2017, 9, 28, 21, 5, 54, 119427),
+                      datetime(2017, 9, 28, 21, 5, 54)]:
+            with self.subTest(value=value):
+                string = models.base_model.format_time(value)
+                self.assertEqual(string, value.strftime(t_format))
+                self.assertEqual(models.base_model.parse_time(string), value)
+        old = datetime(999, 1, 2, 3, 4, 5, 6)
+        self.assertEqual(models.base_model.format_time(old),
+                         old.strftime(t_format))
+        self.assertEqual(models.base_model.parse_time("2017-9-28T1:5:4.1"),
+                         datetime(2017, 9, 28, 1, 5, 4, 100000))
+        with self.assertRaises(ValueError):
+            models.base_model.parse_time("2017-09-28 21:05:54.119427")
+
+    def test_kwargs_round_trip(self):
+        """test that an instance built from to_dict has the same to_dict"""
+        bm = BaseModel()
+        bm.name = "Holberton"
+        d = bm.to_dict()
+        new = BaseModel(**d)
+        self.assertEqual(new.to_dict(), d)
+        self.assertEqual(new.created_at, bm.created_at)
+        self.assertNotIn("__class__", new.__dict__)
+
     def test_str(self):
         """test that the str method has the correct output"""
         inst = BaseModel()
@@ -17,6 +17,8 @@ from models.user import User
 import json
 import os
 import pep8
+import subprocess
+import sys
 import unittest
 DBStorage = db_storage.DBStorage
 classes = {"Amenity": Amenity, "City": City, "Place": Place,
@@ -86,3 +88,415 @@ class TestFileStorage(unittest.TestCase):
     @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
     def test_save(self):
         """Test that save properly saves objects to file.json"""
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_get(self):
+        """Test that get returns the object with the given class and id"""
+        state = State(name="Nevada")
+        models.storage.new(state)
+        models.storage.save()
+        self.assertIs(models.storage.get(State, state.id), state)
+        self.assertIs(models.storage.get("State", state.id), state)
+        self.assertIsNone(models.storage.get(City, state.id))
+        self.assertIsNone(models.storage.get(State, "missing"))
+        models.storage.delete(state)
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_rollback(self):
+        """Test that rollback discards the changes not committed"""
+        state = State(name="Maine")
+        models.storage.new(state)
+        models.storage.save()
+        models.storage.new(State(name="Vermont"))
+        models.storage.delete(state)
+        models.storage.rollback()
+        self.assertIs(models.storage.get(State, state.id), state)
+        self.assertEqual(models.storage.query(State, {"name": "Vermont"}), [])
+        models.storage.delete(state)
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_bulk_save(self):
+        """Test that bulk_save inserts the queued objects parents first"""
+        state = State(name="Utah")
+        cities = [City(name="City {}".format(i), state_id=state.id)
+                  for i in range(5)]
+        count = models.storage.count()
+        models.storage.bulk_new(cities + [state])
+        self.assertEqual(models.storage.count(), count)
+        self.assertEqual(models.storage.bulk_save(chunk=2), 6)
+        self.assertEqual(models.storage.count(), count + 6)
+        self.assertCountEqual([city.id for city in
+                               models.storage.get(State, state.id).cities],
+                              [city.id for city in cities])
+        models.storage.bulk_new([City(name="Orphan", state_id="missing")])
+        with self.assertRaises(Exception):
+            models.storage.bulk_save()
+        self.assertEqual(models.storage.bulk_save(), 0)
+        self.assertEqual(models.storage.count(), count + 6)
+        for city in models.storage.get(State, state.id).cities:
+            models.storage.delete(city)
+        models.storage.delete(models.storage.get(State, state.id))
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_bulk_save_amenities(self):
+        """Test that bulk_save links the places to their amenities"""
+        user = User(email="bulk@hbnb.io", password="pwd")
+        state = State(name="Idaho")
+        city = City(name="Boise", state_id=state.id)
+        wifi = Amenity(name="Wifi")
+        pool = Amenity(name="Pool")
+        place = Place(name="Loft", city_id=city.id, user_id=user.id,
+                      amenity_ids=[wifi.id])
+        place.amenities.append(pool)
+        models.storage.bulk_new([place, wifi, pool, city, state, user])
+        models.storage.bulk_save(amenities=True)
+        stored = models.storage.get(Place, place.id)
+        self.assertEqual(stored.number_rooms, 0)
+        self.assertCountEqual([amenity.name for amenity in stored.amenities],
+                              ["Wifi", "Pool"])
+        for obj in [stored, models.storage.get(Amenity, wifi.id),
+                    models.storage.get(Amenity, pool.id),
+                    models.storage.get(City, city.id),
+                    models.storage.get(State, state.id),
+                    models.storage.get(User, user.id)]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_bulk_save_mixed_columns(self):
+        """Test that bulk_save inserts objects setting different columns"""
+        user = User(email="mixed@hbnb.io", password="pwd")
+        state = State(name="Maine")
+        city = City(name="Portland", state_id=state.id)
+        described = Place(name="Cabin", city_id=city.id, user_id=user.id,
+                          description="By the lake", number_rooms=3)
+        bare = Place(name="Shed", city_id=city.id, user_id=user.id)
+        models.storage.bulk_new([described, bare, city, state, user])
+        self.assertEqual(models.storage.bulk_save(), 5)
+        stored = models.storage.get(Place, described.id)
+        self.assertEqual(stored.description, "By the lake")
+        self.assertEqual(stored.number_rooms, 3)
+        stored = models.storage.get(Place, bare.id)
+        self.assertIsNone(stored.description)
+        self.assertEqual(stored.number_rooms, 0)
+        for obj in [models.storage.get(Place, described.id), stored,
+                    models.storage.get(City, city.id),
+                    models.storage.get(State, state.id),
+                    models.storage.get(User, user.id)]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_count(self):
+        """Test that count matches the number of rows"""
+        total = models.storage.count()
+        states = models.storage.count(State)
+        self.assertEqual(states, len(models.storage.all(State)))
+        self.assertEqual(total, len(models.storage.all()))
+        state = State(name="Oregon")
+        models.storage.new(state)
+        models.storage.save()
+        self.assertEqual(models.storage.count(State), states + 1)
+        self.assertEqual(models.storage.count("State"), states + 1)
+        self.assertEqual(models.storage.count(), total + 1)
+        models.storage.delete(state)
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_query(self):
+        """Test that query filters, sorts and pages the rows of a table"""
+        states = [State(name="Query{}".format(i)) for i in range(5)]
+        for state in states:
+            models.storage.new(state)
+        models.storage.save()
+        names = ["Query1", "Query2", "Query3"]
+        found = models.storage.query(State, {"name": ("in", names)},
+                                     order_by="-name")
+        self.assertEqual([s.name for s in found], names[::-1])
+        found = models.storage.query("State",
+                                     {"name": ("between",
+                                               ("Query0", "Query4"))},
+                                     order_by="name", limit=2, offset=1)
+        self.assertEqual([s.name for s in found], ["Query1", "Query2"])
+        for state in states:
+            models.storage.delete(state)
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_page(self):
+        """Test that page walks the rows in creation order"""
+        states = [State(name="Page{}".format(i),
+                        created_at="2020-01-0{}T00:00:00.000000".format(i))
+                  for i in range(1, 6)]
+        for state in states:
+            models.storage.new(state)
+        models.storage.save()
+        where = {"name": ("in", [state.name for state in states])}
+        first = models.storage.page(State, where, limit=2)
+        self.assertEqual(first, states[:2])
+        after = (first[-1].created_at.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                 first[-1].id)
+        self.assertEqual(models.storage.page(State, where, after=after),
+                         states[2:])
+        for state in states:
+            models.storage.delete(state)
+        models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search_places(self):
+        """Test that search_places combines states, cities and amenities"""
+        user = User(email="search@hbnb.io", password="pwd")
+        state = State(name="Search")
+        other = State(name="Other")
+        cities = [City(state_id=state.id, name="A"),
+                  City(state_id=other.id, name="B")]
+        wifi, pool = Amenity(name="Wifi"), Amenity(name="Pool")
+        places = [Place(city_id=cities[i].id, user_id=user.id, name=str(n),
+                        created_at="2020-01-0{}T00:00:00.000000".format(n))
+                  for n, i in [(1, 0), (2, 1), (3, 1)]]
+        places[0].amenities.append(wifi)
+        places[1].amenities.extend([wifi, pool])
+        for obj in [user, state, other, wifi, pool] + cities + places:
+            models.storage.new(obj)
+        models.storage.save()
+        search = models.storage.search_places
+        self.assertEqual(search([state.id]), places[:1])
+        self.assertEqual(search([state.id], [cities[1].id]), places)
+        self.assertEqual(search(cities=[cities[1].id], limit=1), places[1:2])
+        self.assertEqual(search([state.id], amenities=[wifi.id, pool.id]),
+                         [])
+        self.assertEqual(search(cities=[cities[1].id],
+                                amenities=[wifi.id, pool.id]), places[1:2])
+        self.assertEqual(search(["missing"], amenities=[wifi.id])[:2],
+                         search(amenities=[wifi.id])[:2])
+        for obj in places + cities + [wifi, pool, state, other, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_facet_places(self):
+        """Test that facet_places counts the places found by facet"""
+        user = User(email="facets@hbnb.io", password="pwd")
+        states = [State(name="Facet A"), State(name="Facet B")]
+        cities = [City(state_id=states[i].id, name=str(i)) for i in (0, 0, 1)]
+        wifi, pool = Amenity(name="Wifi"), Amenity(name="Pool")
+        places = [Place(city_id=city.id, user_id=user.id, name=city.name,
+                        price_by_night=price)
+                  for city, price in zip(cities, (50, 150, 100))]
+        places[0].amenities.append(wifi)
+        places[1].amenities.extend([wifi, pool])
+        places[2].amenities.append(pool)
+        for obj in [user, wifi, pool] + states + cities + places:
+            models.storage.new(obj)
+        models.storage.save()
+        facets = models.storage.facet_places([s.id for s in states])
+        self.assertEqual(facets["amenities"], {wifi.id: 2, pool.id: 2})
+        self.assertEqual(facets["cities"], {city.id: 1 for city in cities})
+        self.assertEqual(facets["states"], {states[0].id: 2,
+                                            states[1].id: 1})
+        facets = models.storage.facet_places(
+            [s.id for s in states], amenities=[pool.id],
+            where={"price_by_night": ("<=", 100)})
+        self.assertEqual(facets, {"amenities": {pool.id: 1},
+                                  "cities": {cities[2].id: 1},
+                                  "states": {states[1].id: 1}})
+        for obj in places + cities + states + [wifi, pool, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search_places_ranges(self):
+        """Test the range filters and sort of search_places"""
+        user = User(email="ranges@hbnb.io", password="pwd")
+        state = State(name="Ranges")
+        city = City(state_id=state.id, name="Ranges")
+        prices = [150, 80, 120, 80, 60]
+        places = [Place(city_id=city.id, user_id=user.id, name=str(n),
+                        price_by_night=price, max_guest=n,
+                        created_at="2020-01-0{}T00:00:00.000000".format(n))
+                  for n, price in enumerate(prices, 1)]
+        for obj in [user, state, city] + places:
+            models.storage.new(obj)
+        models.storage.save()
+        search = models.storage.search_places
+        cheap = search(cities=[city.id],
+                       where={"price_by_night": ("<=", 120),
+                              "max_guest": (">=", 3)})
+        self.assertEqual(cheap, [places[2], places[3], places[4]])
+        by_price = search(cities=[city.id], sort="price_by_night")
+        self.assertEqual([p.price_by_night for p in by_price],
+                         sorted(prices))
+        self.assertEqual(search(cities=[city.id], sort="-price_by_night",
+                                limit=2), [places[0], places[2]])
+        self.assertEqual(search(cities=[city.id], sort="price_by_night",
+                                after=(80, by_price[1].id)), by_price[2:])
+        for obj in places + [city, state, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search(self):
+        """Test the full-text search follows committed changes"""
+        user = User(email="search_text@hbnb.io", password="pwd")
+        state = State(name="Text")
+        city = City(state_id=state.id, name="Text")
+        view = Place(city_id=city.id, user_id=user.id, name="Sea view",
+                     description="Ocean view loft")
+        other = Place(city_id=city.id, user_id=user.id, name="Downtown",
+                      description="Loft near the ocean")
+        for obj in [user, state, city, view, other]:
+            models.storage.new(obj)
+        models.storage.save()
+        search = models.storage.search
+        found = search("ocean view")
+        self.assertEqual(found[0][0], view)
+        self.assertIn(other, [obj for obj, score in found])
+        review = Review(place_id=view.id, user_id=user.id,
+                        text="The view of the ocean was great")
+        models.storage.new(review)
+        models.storage.save()
+        self.assertEqual([obj for obj, score in search("great", Review)],
+                         [review])
+        other.description = "Quiet street"
+        models.storage.save()
+        self.assertEqual([obj for obj, score in search("loft")], [view])
+        for obj in [review, view, other, city, state, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+        self.assertEqual(search("ocean"), [])
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search_other_session(self):
+        """Test that a session only commits or forgets its own texts"""
+        user = User(email="search_session@hbnb.io", password="pwd")
+        state = State(name="Session")
+        city = City(state_id=state.id, name="Session")
+        for obj in [user, state, city]:
+            models.storage.new(obj)
+        models.storage.save()
+        self.assertEqual(models.storage.search("harbour"), [])
+        factory = models.storage._DBStorage__session.session_factory
+        other = factory()
+        try:
+            place = Place(city_id=city.id, user_id=user.id, name="Harbour")
+            other.add(place)
+            other.flush()
+            models.storage.save()
+            other.rollback()
+            self.assertEqual(models.storage.search("harbour"), [])
+            place = Place(city_id=city.id, user_id=user.id, name="Harbour")
+            other.add(place)
+            other.flush()
+            models.storage.rollback()
+            other.commit()
+        finally:
+            other.close()
+        self.assertEqual([obj.id for obj, score
+                          in models.storage.search("harbour")], [place.id])
+        for obj in [models.storage.get(Place, place.id), city, state, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search_other_process_update(self):
+        """Test the full-text search follows an older row another process
+        changes with setattr, which does not set updated_at itself"""
+        user = User(email="search_update@hbnb.io", password="pwd")
+        state = State(name="Update")
+        city = City(state_id=state.id, name="Update")
+        older = Place(city_id=city.id, user_id=user.id, name="Older",
+                      description="ocean view")
+        newer = Place(city_id=city.id, user_id=user.id, name="Newer",
+                      description="desert")
+        for obj in [user, state, city, older, newer]:
+            models.storage.new(obj)
+            models.storage.save()
+        self.assertEqual([obj.id for obj, score
+                          in models.storage.search("ocean")], [older.id])
+        env = dict(os.environ)
+        env.pop("HBNB_ENV", None)
+        code = ("from models import storage\n"
+                "from models.place import Place\n"
+                "place = storage.get(Place, {!r})\n"
+                "place.description = 'mountain cabin'\n"
+                "storage.save()")
+        subprocess.run([sys.executable, "-c", code.format(older.id)],
+                       env=env, check=True)
+        models.storage.close()
+        self.assertEqual(models.storage.search("ocean"), [])
+        self.assertEqual([obj.id for obj, score
+                          in models.storage.search("mountain")], [older.id])
+        for obj in [models.storage.get(Place, older.id),
+                    models.storage.get(Place, newer.id),
+                    models.storage.get(City, city.id),
+                    models.storage.get(State, state.id),
+                    models.storage.get(User, user.id)]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_search_other_process(self):
+        """Test the full-text search follows rows of other processes"""
+        user = User(email="search_other@hbnb.io", password="pwd")
+        state = State(name="Other")
+        city = City(state_id=state.id, name="Other")
+        for obj in [user, state, city]:
+            models.storage.new(obj)
+        models.storage.save()
+        self.assertEqual(models.storage.search("lighthouse"), [])
+        env = dict(os.environ)
+        env.pop("HBNB_ENV", None)
+        code = ("from models import storage\n"
+                "from models.place import Place\n"
+                "place = Place(city_id={!r}, user_id={!r}, name='Lighthouse')"
+                "\nstorage.new(place)\nstorage.save()\nprint(place.id)")
+        out = subprocess.run([sys.executable, "-c",
+                              code.format(city.id, user.id)],
+                             env=env, capture_output=True, text=True,
+                             check=True)
+        id = out.stdout.strip()
+        models.storage.close()
+        self.assertEqual([obj.id for obj, score
+                          in models.storage.search("lighthouse")], [id])
+        code = ("from models import storage\n"
+                "from models.place import Place\n"
+                "storage.delete(storage.get(Place, {!r}))\nstorage.save()")
+        subprocess.run([sys.executable, "-c", code.format(id)], env=env,
+                       check=True)
+        models.storage.close()
+        self.assertEqual(models.storage.search("lighthouse"), [])
+        for obj in [city, state, user]:
+            models.storage.delete(obj)
+            models.storage.save()
+
+    @unittest.skipIf(models.storage_t != 'db', "not testing db storage")
+    def test_places_nearby(self):
+        """Test the bounding box and nearest neighbour place searches"""
+        user = User(email="nearby@hbnb.io", password="pwd")
+        state = State(name="Nearby")
+        city = City(state_id=state.id, name="Nearby")
+        points = [(48.85, 2.35), (48.86, 2.29), (51.50, -0.12), (-17.7, 179.9)]
+        places = [Place(city_id=city.id, user_id=user.id, name=str(n),
+                        latitude=lat, longitude=lon,
+                        created_at="2020-01-0{}T00:00:00.000000".format(n))
+                  for n, (lat, lon) in enumerate(points, 1)]
+        for obj in [user, state, city] + places:
+            models.storage.new(obj)
+        models.storage.save()
+        self.assertEqual(models.storage.places_within(48, 2, 52, 3),
+                         places[:2])
+        self.assertEqual(models.storage.places_within(48, -1, 52, 3, 2),
+                         places[:2])
+        self.assertEqual(models.storage.places_within(-18, 179, -17, -179),
+                         places[3:4])
+        found = models.storage.nearest_places(48.853, 2.349, k=2)
+        self.assertEqual([place for place, dist in found], places[:2])
+        self.assertLess(found[0][1], 1)
+        found = models.storage.nearest_places(-17.7, -179.9, radius=100)
+        self.assertEqual([place for place, dist in found], places[3:4])
+        for obj in places + [city, state, user]:
+            models.storage.delete(obj)
+            models.storage.save()
@@ -3,12 +3,14 @@
 Contains the TestFileStorageDocs classes
 """
 
+from array import array
 from datetime import datetime
 import inspect
 import models
-from models.engine import file_storage
+from models.engine import bitmap as bitmap_module, columns, file_storage
+from models.engine import text
 from models.amenity import Amenity
-from models.base_model import BaseModel
+from models.base_model import BaseModel, format_time
 from models.city import City
 from models.place import Place
 from models.review import Review
@@ -17,7 +19,10 @@ from models.user import User
 import json
 import os
 import pep8
+import subprocess
+import sys
 import unittest
+from unittest import mock
 FileStorage = file_storage.FileStorage
 classes = {"Amenity": Amenity, "BaseModel": BaseModel, "City": City,
            "Place": Place, "Review": Review, "State": State, "User": User}
@@ -105,12 +110,758 @@ class TestFileStorage(unittest.TestCase):
             instance_key = instance.__class__.__name__ + "." + instance.id
             new_dict[instance_key] = instance
         save = FileStorage._FileStorage__objects
+        journal = FileStorage._FileStorage__journal
         FileStorage._FileStorage__objects = new_dict
-        storage.save()
-        FileStorage._FileStorage__objects = save
+        FileStorage._FileStorage__journal = False
+        try:
+            storage.save()
+        finally:
+            FileStorage._FileStorage__objects = save
+            FileStorage._FileStorage__journal = journal
         for key, value in new_dict.items():
             new_dict[key] = value.to_dict()
         string = json.dumps(new_dict)
         with open("file.json", "r") as f:
             js = f.read()
         self.assertEqual(json.loads(string), json.loads(js))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_all_class(self):
+        """Test that all(cls) only returns the objects of that class"""
+        storage = FileStorage()
+        state = State()
+        city = City()
+        storage.new(state)
+        storage.new(city)
+        states = storage.all(State)
+        self.assertIn("State." + state.id, states)
+        self.assertNotIn("City." + city.id, states)
+        self.assertEqual(states, storage.all("State"))
+        for obj in states.values():
+            self.assertIs(type(obj), State)
+        storage.delete(state)
+        storage.delete(city)
+        self.assertNotIn("State." + state.id, storage.all(State))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_count(self):
+        """Test that count follows new and delete for each class"""
+        storage = FileStorage()
+        total = storage.count()
+        amenities = storage.count(Amenity)
+        amenity = Amenity()
+        storage.new(amenity)
+        self.assertEqual(storage.count(Amenity), amenities + 1)
+        self.assertEqual(storage.count("Amenity"), amenities + 1)
+        self.assertEqual(storage.count(), total + 1)
+        storage.delete(amenity)
+        self.assertEqual(storage.count(Amenity), amenities)
+        self.assertEqual(storage.count(), total)
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_related(self):
+        """Test that related follows foreign keys changed with setattr"""
+        storage = FileStorage()
+        state = State()
+        other = State()
+        city = City(state_id=state.id)
+        storage.new(city)
+        self.assertEqual(storage.related(City, "state_id", state.id), [city])
+        city.state_id = other.id
+        self.assertEqual(storage.related(City, "state_id", state.id), [])
+        self.assertEqual(storage.related("City", "state_id", other.id),
+                         [city])
+        storage.delete(city)
+        self.assertEqual(storage.related(City, "state_id", other.id), [])
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_cached(self):
+        """Test that to_dict results are cached until an attribute is set"""
+        storage = FileStorage()
+        amenity = Amenity(name="Wifi")
+        self.assertIsNone(storage.cached(amenity))
+        amenity.to_dict()
+        self.assertIsNone(storage.cached(amenity))
+        storage.new(amenity)
+        first = amenity.to_dict()
+        self.assertEqual(storage.cached(amenity), first)
+        first["name"] = "Changed"
+        self.assertEqual(amenity.to_dict()["name"], "Wifi")
+        amenity.name = "Pool"
+        self.assertIsNone(storage.cached(amenity))
+        self.assertEqual(amenity.to_dict()["name"], "Pool")
+        storage.delete(amenity)
+        self.assertIsNone(storage.cached(amenity))
+
+    @unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+    def test_cached_limit(self):
+        """Test that only the to_dict results used last are cached"""
+        storage = FileStorage()
+        amenities = [Amenity(name=str(i)) for i in range(3)]
+        with mock.patch.object(FileStorage, "_FileStorage__serialized_limit",
+                               2):
+            for amenity in amenities:
+                storage.new(amenity)
+                amenity.to_dict()
+            self.assertIsNone(storage.cached(amenities[0]))
+            self.assertIsNotNone(storage.cached(amenities[1]))
+            amenities[0].to_dict()
+            self.assertIsNone(storage.cached(amenities[2]))
+            self.assertIsNotNone(storage.cached(amenities[1]))
+        for amenity in amenities:
+            storage.delete(amenity)
+
+    def test_bitmap(self):
+        """Test the AND, OR and COUNT of the place/amenity bitmap"""
+        bitmap = bitmap_module.Bitmap()
+        self.assertEqual(bitmap.set("a", ["wifi", "pool"]), ["wifi", "pool"])
+        bitmap.set("b", ["wifi"])
+        bitmap.set("c", ["pool", "gym"])
+        self.assertEqual(sorted(bitmap.rows_of(bitmap.all_of(["wifi"]))),
+                         ["a", "b"])
+        self.assertEqual(bitmap.rows_of(bitmap.all_of(["wifi", "pool"])),
+                         ["a"])
+        either = bitmap.any_of(["wifi", "gym"])
+        self.assertEqual(sorted(bitmap.rows_of(either)), ["a", "b", "c"])
+        self.assertEqual(bitmap.all_of(["missing"]), 0)
+        self.assertEqual(bitmap.counts(), {"wifi": 2, "pool": 2, "gym": 1})
+        self.assertEqual(bitmap.counts(bitmap.rows_mask(["a", "c"])),
+                         {"wifi": 1, "pool": 2, "gym": 1})
+        self.assertTrue(bitmap.has_all("c", ["gym", "pool"]))
+        bitmap.remove("a")
+        bitmap.set("d", ["gym"])
+        self.assertEqual(bitmap.columns_of("d"), ["gym"])
+        self.assertIsNone(bitmap.columns_of("a"))
+        self.assertEqual(bitmap.counts(), {"wifi": 1, "pool": 1, "gym": 2})
+        self.assertEqual(len(bitmap), 3)
+
+
+@unittest.skipIf(models.storage_t == 'db', "not testing file storage")
+class TestFileStorageEngine(unittest.TestCase):
+    """Test the FileStorage engine on an empty store of its own file"""
+    # string - path of the JSON file of the tests
+    path = "test_file_storage.json"
+    # tuple - class attributes of FileStorage the tests may change
+    attrs = ("file_path", "objects", "records", "dirty", "deleted", "journal",
+             "journal_limit", "lazy", "columnar")
+
+    def setUp(self):
+        """points FileStorage at an empty store saved to path"""
+        self.saved = {name: getattr(FileStorage, "_FileStorage__" + name)
+                      for name in self.attrs}
+        self.configure(file_path=self.path, objects={},
+                       records=type(self.saved["records"])(), dirty=set(),
+                       deleted=set())
+
+    def tearDown(self):
+        """restores the store of the other tests and removes the files"""
+        self.configure(**self.saved)
+        for suffix in ["", ".journal", ".search", ".tmp", ".lock"]:
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def configure(self, **attrs):
+        """sets class attributes of FileStorage, named without __"""
+        for name, value in attrs.items():
+            setattr(FileStorage, "_FileStorage__" + name, value)
+
+    def test_save_journal(self):
+        """Test that journaled saves append records that reload replays"""
+        storage = FileStorage()
+        self.configure(journal=True)
+        kept = State(name="Kept")
+        gone = State(name="Gone")
+        storage.new(kept)
+        storage.new(gone)
+        storage.save()
+        storage.delete(gone)
+        kept.name = "Renamed"
+        storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.path + ".journal", "r") as f:
+            self.assertEqual(len(f.readlines()), 4)
+        self.configure(objects={})
+        storage.reload()
+        self.assertEqual(list(storage.all()), ["State." + kept.id])
+        self.assertEqual(storage.all()["State." + kept.id].name,
+                         "Renamed")
+        self.configure(journal_limit=0)
+        storage.new(gone)
+        storage.save()
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        self.configure(objects={})
+        storage.reload()
+        self.assertEqual(storage.count(State), 2)
+
+    def test_close_unchanged(self):
+        """Test that close does not parse the JSON file if it is unchanged"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        storage.save()
+        with mock.patch.object(file_storage.json, "load") as load:
+            storage.close()
+            load.assert_not_called()
+        os.utime(self.path, ns=(0, 0))
+        with mock.patch.object(file_storage.json, "load",
+                               wraps=json.load) as load:
+            storage.close()
+            load.assert_called_once()
+
+    def test_close_deleted(self):
+        """Test that close drops the objects deleted from the file since"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        kept, gone = State(name="Kept"), State(name="Gone")
+        storage.new(kept)
+        storage.new(gone)
+        storage.save()
+        storage.reload()
+        with open(self.path) as f:
+            jo = json.load(f)
+        del jo["State." + gone.id]
+        with open(self.path, "w") as f:
+            json.dump(jo, f)
+        unsaved = State(name="Unsaved")
+        storage.new(unsaved)
+        storage.close()
+        self.assertEqual(storage.count(State), 2)
+        self.assertIsNone(storage.get(State, gone.id))
+        self.assertEqual(storage.get(State, kept.id).name, "Kept")
+        self.assertIs(storage.get(State, unsaved.id), unsaved)
+
+    def test_reload_unchanged(self):
+        """Test that reload only indexes the records changed since read,
+        and the foreign keys and the grid once used"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        state = State(name="Same")
+        city = City(state_id=state.id, name="Same")
+        place = Place(city_id=city.id, latitude=1.0, longitude=2.0)
+        for obj in [state, city, place]:
+            storage.new(obj)
+        storage.save()
+        self.configure(lazy=True, objects={},
+                       records=type(self.saved["records"])())
+        storage.reload()
+        self.assertEqual(storage._FileStorage__references, {})
+        self.assertIsNone(storage._FileStorage__grid)
+        with mock.patch.object(FileStorage, "_FileStorage__add",
+                               autospec=True,
+                               side_effect=FileStorage._FileStorage__add
+                               ) as add:
+            storage.reload()
+            add.assert_not_called()
+        self.assertEqual(storage.related(City, "state_id", state.id)[0].id,
+                         city.id)
+        self.assertIn("City", storage._FileStorage__references)
+        self.assertNotIn("Place", storage._FileStorage__references)
+        self.assertEqual([p.id for p in storage.places_within(0, 1, 2, 3)],
+                         [place.id])
+        self.assertIsNotNone(storage._FileStorage__grid)
+
+    def test_reload_objects_unchanged(self):
+        """Test that reload compares the stored objects with their records
+        without serializing them, and replaces the changed ones"""
+        storage = FileStorage()
+        self.configure(lazy=False, journal=False)
+        same = State(name="Same")
+        changed = State(name="Before")
+        storage.new(same)
+        storage.new(changed)
+        storage.save()
+        with open(self.path, "r") as f:
+            records = json.load(f)
+        records["State." + changed.id]["name"] = "After"
+        with open(self.path, "w") as f:
+            json.dump(records, f)
+        with mock.patch.object(State, "to_dict") as to_dict:
+            storage.reload()
+            to_dict.assert_not_called()
+        self.assertIs(storage.get(State, same.id), same)
+        self.assertEqual(storage.get(State, changed.id).name, "After")
+
+    def test_compact_journal_of_others(self):
+        """Test that compacting keeps the records another process appended
+        to the journal since this one last read it"""
+        storage = FileStorage()
+        self.configure(journal=True)
+        storage.new(State(name="A1"))
+        storage.save()
+        code = ("from models.engine.file_storage import FileStorage\n"
+                "from models.state import State\n"
+                "FileStorage._FileStorage__file_path = {!r}\n"
+                "FileStorage._FileStorage__journal = True\n"
+                "storage = FileStorage()\n"
+                "storage.reload()\n"
+                "storage.new(State(name='FromB'))\n"
+                "storage.save()").format(self.path)
+        subprocess.run([sys.executable, "-c", code], check=True)
+        self.configure(journal_limit=0)
+        storage.new(State(name="A2"))
+        storage.save()
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        self.configure(objects={}, records=type(self.saved["records"])())
+        storage.reload()
+        self.assertCountEqual([state.name for state
+                               in storage.all(State).values()],
+                              ["A1", "A2", "FromB"])
+
+    def test_close_journal_tail(self):
+        """Test that close applies records appended to the journal"""
+        storage = FileStorage()
+        self.configure(journal=True)
+        state = State(name="Tail")
+        storage.new(state)
+        storage.save()
+        record = {"key": "State." + state.id, "value": None}
+        with open(self.path + ".journal", "a") as f:
+            f.write(json.dumps(record) + "\n")
+        with mock.patch.object(file_storage.json, "load") as load:
+            storage.close()
+            load.assert_not_called()
+        self.assertEqual(storage.count(State), 0)
+
+    def test_save_journal_lazy(self):
+        """Test that an object reloaded raw while changed is not deleted"""
+        storage = FileStorage()
+        self.configure(journal=True, lazy=True)
+        state = State(name="Mine")
+        storage.new(state)
+        storage.save()
+        state.name = "Unsaved"
+        record = dict(state.to_dict(), name="Theirs")
+        with open(self.path + ".journal", "a") as f:
+            f.write(json.dumps({"key": "State." + state.id,
+                                "value": record}) + "\n")
+        storage.close()
+        storage.save()
+        self.configure(objects={})
+        storage.reload()
+        self.assertEqual(storage.get(State, state.id).name, "Theirs")
+        storage.delete(storage.get(State, state.id))
+        storage.save()
+        self.configure(objects={})
+        storage.reload()
+        self.assertEqual(storage.count(State), 0)
+
+    def test_bulk_save(self):
+        """Test that bulk_save writes the objects of bulk_new at once"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        states = [State(name="State {}".format(i)) for i in range(5)]
+        storage.bulk_new(states)
+        self.assertEqual(storage.count(State), 5)
+        with mock.patch.object(storage, "compact",
+                               wraps=storage.compact) as compact:
+            self.assertEqual(storage.bulk_save(), 5)
+            compact.assert_called_once()
+        with open(self.path, "r") as f:
+            self.assertCountEqual(json.load(f), ["State." + state.id
+                                                 for state in states])
+
+    def test_rollback(self):
+        """Test that rollback restores the objects as last saved"""
+        storage = FileStorage()
+        kept = State(name="Kept")
+        changed = State(name="Before")
+        gone = State(name="Gone")
+        for obj in (kept, changed, gone):
+            storage.new(obj)
+        storage.save()
+        changed.name = "After"
+        storage.delete(gone)
+        storage.new(State(name="Added"))
+        storage.rollback()
+        names = [obj.name for obj in storage.all(State).values()]
+        self.assertCountEqual(names, ["Kept", "Before", "Gone"])
+        self.assertIs(storage.get(State, kept.id), kept)
+        self.assertEqual(storage.query(State, {"name": "After"}), [])
+
+    def test_cached_delattr(self):
+        """Test that deleting an attribute drops the cached serialization"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        state = State(name="Ohio")
+        storage.new(state)
+        state.extra = "x"
+        storage.save()
+        self.assertEqual(state.to_dict()["extra"], "x")
+        del state.extra
+        self.assertIsNone(storage.cached(state))
+        storage.save()
+        self.assertNotIn("extra", state.to_dict())
+        with open(self.path, "r") as f:
+            self.assertNotIn("extra", json.load(f)["State." + state.id])
+
+    def test_reload_lazy(self):
+        """Test that lazy reloads only build objects when accessed"""
+        storage = FileStorage()
+        state = State(name="Lazy")
+        city = City(state_id=state.id)
+        storage.new(state)
+        storage.new(city)
+        storage.save()
+        self.configure(lazy=True, objects={})
+        storage.reload()
+        self.assertEqual(storage.count(State), 1)
+        self.assertEqual(storage.count(), 2)
+        self.assertEqual(storage._FileStorage__objects, {})
+        loaded = storage.get(State, state.id)
+        self.assertEqual(loaded.name, "Lazy")
+        self.assertIs(storage.get(State, state.id), loaded)
+        self.assertNotIn("City." + city.id, storage._FileStorage__objects)
+        self.assertEqual([c.id for c in loaded.cities], [city.id])
+        self.assertEqual(len(storage.all()), 2)
+
+    def test_save_lazy_fragments(self):
+        """Test that saves only serialize the raw records and objects
+        changed since their JSON text was last written"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        states = [State(name=str(i)) for i in range(3)]
+        for state in states:
+            storage.new(state)
+        storage.save()
+        self.configure(lazy=True, columnar=False, objects={}, records={})
+        storage.reload()
+        storage.save()
+        storage.get(State, states[0].id).name = "Changed"
+        storage.get(State, states[1].id)
+        with mock.patch.object(file_storage.json, "dumps",
+                               wraps=json.dumps) as dumps:
+            storage.save()
+        self.assertEqual([call[0][0]["name"] for call in dumps.call_args_list
+                          if isinstance(call[0][0], dict)], ["Changed"])
+        self.configure(lazy=False, objects={}, records={})
+        storage.reload()
+        self.assertCountEqual([state.name for state
+                               in storage.all(State).values()],
+                              ["Changed", "1", "2"])
+
+    def test_reload_columnar(self):
+        """Test that columnar reloads keep records in typed columns"""
+        storage = FileStorage()
+        self.configure(journal=False)
+        places = [Place(city_id="c", name=str(n), price_by_night=n,
+                        amenity_ids=["a"] * n) for n in range(3)]
+        review = Review(place_id=places[0].id, text="Good")
+        for obj in places + [review]:
+            storage.new(obj)
+        storage.save()
+        dicts = {key: obj.to_dict() for key, obj in storage.all().items()}
+        self.configure(lazy=True, columnar=True, objects={},
+                       records=columns.ColumnStore())
+        storage.reload()
+        self.assertEqual(storage._FileStorage__objects, {})
+        table = storage._FileStorage__records.tables["Place"]
+        self.assertEqual(table["columns"]["price_by_night"].cells,
+                         array("q", [0, 1, 2]))
+        self.assertEqual(table["columns"]["city_id"].strings, ["c"])
+        self.assertEqual(table["columns"]["created_at"].kind, "date")
+        found = storage.search_places(where={"price_by_night": (">=", 1)})
+        self.assertEqual([p.id for p in found], [p.id for p in places[1:]])
+        self.assertEqual(storage.get(Place, places[1].id).to_dict(),
+                         dicts["Place." + places[1].id])
+        self.assertEqual(len(storage.all(Place)), 3)
+        self.assertEqual(storage._FileStorage__objects, {})
+        del found
+        self.assertEqual(len(storage._FileStorage__views), 0)
+        view = storage.get(Place, places[2].id)
+        self.assertIs(storage.get(Place, places[2].id), view)
+        first = storage.get(Place, places[0].id)
+        self.assertIs(first.reviews[0], storage.get(Review, review.id))
+        view.name = "Changed"
+        self.assertIs(storage._FileStorage__objects["Place." + view.id],
+                      view)
+        self.assertNotIn("Place." + view.id,
+                         storage._FileStorage__records)
+        self.assertEqual(storage.query(Place, {"name": "Changed"}),
+                         [view])
+        dicts["Place." + view.id] = view.to_dict()
+        storage.save()
+        self.configure(objects={})
+        storage.reload()
+        self.assertEqual({key: obj.to_dict() for key, obj
+                          in storage.all().items()}, dicts)
+
+    def test_query(self):
+        """Test that query filters, sorts and pages the objects of a class"""
+        storage = FileStorage()
+        city = City()
+        places = [Place(city_id=city.id, name=str(i), price_by_night=i,
+                        max_guest=i % 3) for i in range(10)]
+        for place in places:
+            storage.new(place)
+        storage.new(Place(city_id="other", price_by_night=5))
+        found = storage.query(Place, {"city_id": city.id,
+                                      "price_by_night": ("between",
+                                                         (2, 7)),
+                                      "max_guest": (">=", 1)},
+                              order_by="-price_by_night")
+        self.assertEqual([p.name for p in found],
+                         ["7", "5", "4", "2"])
+        found = storage.query("Place", {"city_id": ("in", [city.id])},
+                              order_by="price_by_night",
+                              limit=3, offset=2)
+        self.assertEqual([p.name for p in found], ["2", "3", "4"])
+        self.assertEqual(storage.query(Place, {"id": places[0].id}),
+                         [places[0]])
+        self.assertEqual(storage.query(City), [])
+        with self.assertRaises(ValueError):
+            storage.query(Place, {"price_by_night": ("between", (1,))})
+
+    def test_page(self):
+        """Test that page walks the objects in creation order"""
+        storage = FileStorage()
+        states = [State(name=str(i),
+                        created_at="2020-01-0{}T00:00:00.000000".format(i))
+                  for i in range(1, 6)]
+        for state in reversed(states):
+            storage.new(state)
+        first = storage.page(State, limit=2)
+        self.assertEqual(first, states[:2])
+        after = (format_time(first[-1].created_at),
+                 first[-1].id)
+        self.assertEqual(storage.page(State, limit=2, after=after),
+                         states[2:4])
+        storage.delete(states[2])
+        self.assertEqual(storage.page(State, after=after), states[3:])
+        self.assertEqual(storage.page(State, {"name": "5"}, after=after),
+                         states[4:])
+
+    def test_search_places(self):
+        """Test that search_places combines states, cities and amenities"""
+        storage = FileStorage()
+        state = State()
+        cities = [City(state_id=state.id), City(state_id="other")]
+        wifi, pool = Amenity(), Amenity()
+        places = [Place(city_id=cities[0].id, amenity_ids=[wifi.id],
+                        created_at="2020-01-01T00:00:00.000000"),
+                  Place(city_id=cities[1].id,
+                        amenity_ids=[wifi.id, pool.id],
+                        created_at="2020-01-02T00:00:00.000000"),
+                  Place(city_id=cities[1].id,
+                        created_at="2020-01-03T00:00:00.000000")]
+        for obj in [state, wifi, pool] + cities + places:
+            storage.new(obj)
+        self.assertEqual(storage.search_places(), places)
+        self.assertEqual(storage.search_places([state.id]), places[:1])
+        self.assertEqual(storage.search_places([state.id],
+                                               [cities[1].id]), places)
+        self.assertEqual(storage.search_places(amenities=[wifi.id]),
+                         places[:2])
+        self.assertEqual(storage.search_places(amenities=[wifi.id,
+                                                          pool.id]),
+                         places[1:2])
+        places[2].amenity_ids = [pool.id]
+        self.assertEqual(storage.search_places(amenities=[pool.id],
+                                               limit=1),
+                         places[1:2])
+        self.assertEqual(storage.search_places(amenities=["missing"]),
+                         [])
+
+    def test_amenities_of(self):
+        """Test that Place.amenities follows the amenity bitmap"""
+        storage = FileStorage()
+        wifi, pool = Amenity(), Amenity()
+        place = Place()
+        for obj in [wifi, pool, place]:
+            storage.new(obj)
+        self.assertEqual(place.amenities, [])
+        place.amenities = wifi
+        place.amenities = pool
+        place.amenities = wifi
+        self.assertEqual(place.amenity_ids, [wifi.id, pool.id])
+        self.assertEqual(place.amenities, [wifi, pool])
+        self.assertEqual(storage.search_places(amenities=[pool.id]),
+                         [place])
+        self.assertEqual(Place().amenity_ids, [])
+        other = Place(amenity_ids=["".join(pool.id)])
+        storage.new(other)
+        self.assertIs(other.amenity_ids[0], place.amenity_ids[1])
+        other.to_dict()
+        other.amenity_ids.append(wifi.id)
+        self.assertCountEqual(other.amenities, [pool, wifi])
+        self.assertEqual(storage.search_places(amenities=[wifi.id]),
+                         [place, other])
+        self.assertCountEqual(other.to_dict()["amenity_ids"],
+                              [pool.id, wifi.id])
+        other.amenity_ids.remove(pool.id)
+        self.assertEqual(storage.search_places(amenities=[pool.id]),
+                         [place])
+        storage.delete(pool)
+        self.assertEqual(place.amenities, [wifi])
+        storage.delete(other)
+        self.assertEqual(other.__dict__["amenity_ids"], [wifi.id])
+        self.assertEqual(type(other.amenity_ids), list)
+
+    def test_amenity_ids_in_bitmap(self):
+        """Test that a stored place keeps no list of its amenity ids"""
+        storage = FileStorage()
+        wifi, pool = Amenity(), Amenity()
+        places = [Place(amenity_ids=[wifi.id, pool.id]), Place()]
+        for obj in places + [wifi, pool]:
+            storage.new(obj)
+        storage.save()
+        self.assertNotIsInstance(places[0].__dict__["amenity_ids"], list)
+        self.assertNotIn("amenity_ids", places[1].__dict__)
+        self.assertEqual(places[0].amenity_ids, [wifi.id, pool.id])
+        self.assertEqual(places[1].amenity_ids, [])
+        self.assertIn("amenity_ids", str(places[0]))
+        self.assertIn(repr(wifi.id), str(places[0]))
+        self.configure(objects={})
+        storage.reload()
+        place = storage.get(Place, places[0].id)
+        self.assertIsNot(place, places[0])
+        self.assertNotIsInstance(place.__dict__["amenity_ids"], list)
+        self.assertEqual(place.to_dict()["amenity_ids"], [wifi.id, pool.id])
+        self.assertNotIn("amenity_ids", storage.get(Place, places[1].id)
+                         .to_dict())
+        self.assertEqual(places[0].amenity_ids, [wifi.id, pool.id])
+        storage.reload()
+        self.assertIs(storage.get(Place, places[0].id), place)
+        place.amenity_ids = [pool.id]
+        storage.compact()
+        self.assertEqual(places[0].amenity_ids, [wifi.id, pool.id])
+        with open(self.path) as f:
+            record = json.load(f)["Place." + place.id]
+        self.assertEqual(record["amenity_ids"], [pool.id])
+
+    def test_facet_places(self):
+        """Test that facet_places counts the places found by facet"""
+        storage = FileStorage()
+        states = [State(), State()]
+        cities = [City(state_id=states[0].id), City(state_id=states[0].id),
+                  City(state_id=states[1].id)]
+        wifi, pool = Amenity(), Amenity()
+        places = [Place(city_id=cities[0].id, amenity_ids=[wifi.id],
+                        price_by_night=50),
+                  Place(city_id=cities[1].id,
+                        amenity_ids=[wifi.id, pool.id],
+                        price_by_night=150),
+                  Place(city_id=cities[2].id, amenity_ids=[pool.id],
+                        price_by_night=100)]
+        for obj in states + cities + places + [wifi, pool]:
+            storage.new(obj)
+        facets = storage.facet_places()
+        self.assertEqual(facets["amenities"], {wifi.id: 2, pool.id: 2})
+        self.assertEqual(facets["cities"], {city.id: 1 for city in cities})
+        self.assertEqual(facets["states"], {states[0].id: 2,
+                                            states[1].id: 1})
+        facets = storage.facet_places(amenities=[pool.id],
+                                      where={"price_by_night":
+                                             ("<=", 100)})
+        self.assertEqual(facets, {"amenities": {pool.id: 1},
+                                  "cities": {cities[2].id: 1},
+                                  "states": {states[1].id: 1}})
+        places[2].city_id = cities[0].id
+        self.assertEqual(storage.facet_places([states[0].id])["states"],
+                         {states[0].id: 3})
+
+    def test_search_places_ranges(self):
+        """Test the range filters and sort of search_places"""
+        storage = FileStorage()
+        prices = [150, 80, 120, 80, 60]
+        places = [Place(price_by_night=price, max_guest=n,
+                        created_at="2020-01-0{}T00:00:00.000000".format(n))
+                  for n, price in enumerate(prices, 1)]
+        for place in places:
+            storage.new(place)
+        self.assertNotIn("Place", FileStorage._FileStorage__sorted)
+        search = storage.search_places
+        cheap = search(where={"price_by_night": ("<=", 120),
+                              "max_guest": (">=", 3)})
+        self.assertEqual(cheap, [places[2], places[3], places[4]])
+        self.assertEqual(search(where={"price_by_night": (">", 80)}),
+                         [places[0], places[2]])
+        by_price = search(sort="price_by_night")
+        self.assertEqual([p.price_by_night for p in by_price],
+                         sorted(prices))
+        self.assertEqual(search(sort="-price_by_night", limit=2),
+                         [places[0], places[2]])
+        last = by_price[1]
+        self.assertEqual(search(sort="price_by_night",
+                                after=(80, last.id)), by_price[2:])
+        places[0].price_by_night = 10
+        self.assertEqual(search(sort="price_by_night", limit=1),
+                         places[:1])
+        between = {"price_by_night": ("between", (60, 80))}
+        self.assertCountEqual(storage.query(Place, between),
+                              [places[1], places[3], places[4]])
+        cheapest = Place(price_by_night=5)
+        storage.new(cheapest)
+        self.assertEqual(search(sort="price_by_night", limit=1),
+                         [cheapest])
+        with self.assertRaises(ValueError):
+            search(sort="latitude")
+
+    def test_search(self):
+        """Test the full-text search and its persisted index"""
+        storage = FileStorage()
+        view = Place(name="Sea view", description="Ocean view loft")
+        city = Place(name="Downtown", description="Loft near the ocean")
+        review = Review(text="The view of the ocean was great")
+        for obj in [view, city, review]:
+            storage.new(obj)
+        found = storage.search("ocean view")
+        self.assertEqual(len(found), 3)
+        self.assertEqual(found[0][0], view)
+        self.assertEqual([obj for obj, score in
+                          storage.search("ocean", Review)], [review])
+        self.assertEqual([obj for obj, score in
+                          storage.search("view", Place)], [view])
+        self.assertTrue(os.path.exists(self.path + ".search"))
+        city.description = "Quiet street"
+        self.assertEqual([obj for obj, score in
+                          storage.search("loft")], [view])
+        storage.delete(review)
+        self.assertEqual(storage.search("great"), [])
+        self.configure(objects=dict(FileStorage._FileStorage__objects))
+        with mock.patch("models.engine.text.tokenize",
+                        wraps=text.tokenize) as tokenize:
+            self.assertEqual([obj for obj, score in
+                              storage.search("loft")], [view])
+        # only the changed place and the query itself are tokenized
+        self.assertEqual(tokenize.call_count, 2)
+
+    def test_places_nearby(self):
+        """Test the bounding box and nearest neighbour place searches"""
+        storage = FileStorage()
+        places = [Place(latitude=48.85, longitude=2.35,
+                        created_at="2020-01-01T00:00:00.000000"),
+                  Place(latitude=48.86, longitude=2.29,
+                        created_at="2020-01-02T00:00:00.000000"),
+                  Place(latitude=51.50, longitude=-0.12,
+                        created_at="2020-01-03T00:00:00.000000"),
+                  Place(latitude=-17.7, longitude=179.9,
+                        created_at="2020-01-04T00:00:00.000000"),
+                  Place(created_at="2020-01-05T00:00:00.000000")]
+        for place in places:
+            storage.new(place)
+        self.assertEqual(storage.places_within(48, 2, 52, 3),
+                         places[:2])
+        self.assertEqual(storage.places_within(48, -1, 52, 3, limit=2),
+                         places[:2])
+        self.assertEqual(storage.places_within(-18, 179, -17, -179),
+                         places[3:4])
+        found = storage.nearest_places(48.853, 2.349, k=2)
+        self.assertEqual([place for place, dist in found], places[:2])
+        self.assertLess(found[0][1], 1)
+        found = storage.nearest_places(-17.7, -179.9, radius=100)
+        self.assertEqual([place for place, dist in found], places[3:4])
+        found = storage.nearest_places(48.853, 2.349, k=10,
+                                       radius=float("nan"))
+        self.assertEqual([place for place, dist in found], places[:4])
+        places[2].latitude = 48.853
+        places[2].longitude = 2.349
+        self.assertEqual(storage.nearest_places(48.853, 2.349, k=1)[0],
+                         (places[2], 0))
+        storage.delete(places[2])
+        self.assertEqual(storage.places_within(48, -1, 52, 3),
+                         places[:2])
+        self.assertEqual(storage.places_within(-1, -1, 1, 1), [])
+        self.assertEqual(storage.nearest_places(0.1, 0.1, radius=50), [])
+        places[4].latitude = 0.0
+        places[4].longitude = 0.0
+        self.assertEqual(storage.places_within(-1, -1, 1, 1),
+                         places[4:])
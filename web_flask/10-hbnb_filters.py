@@ -14,8 +14,9 @@ def filters():
     """display a HTML page like 6-index.html from static"""
     states = storage.all("State").values()
     amenities = storage.all("Amenity").values()
+    facets = storage.facet_places()
     return render_template('10-hbnb_filters.html', states=states,
-                           amenities=amenities)
+                           amenities=amenities, facets=facets)
 
 
 @app.teardown_appcontext